@@ -0,0 +1,136 @@
+import csv
+import json
+import multiprocessing
+import sys
+
+import degrees
+from degrees import load_data, shortest_path
+
+FIELDS = ["source", "target", "source_id", "target_id", "status", "degrees", "path"]
+
+
+def main():
+    if len(sys.argv) not in [4, 5]:
+        sys.exit("Usage: python batch.py directory pairs.csv output.[csv|jsonl] [workers]")
+    directory, pairs_file, output_file = sys.argv[1:4]
+    workers = int(sys.argv[4]) if len(sys.argv) == 5 else 1
+
+    # Load data from files into memory once for every query
+    print("Loading data...")
+    load_data(directory, cache=True)
+    print("Data loaded.")
+
+    pairs = load_pairs(pairs_file)
+    results = run_queries(pairs, directory, workers)
+    count = write_results(results, output_file)
+    print(f"Answered {count} queries.")
+
+
+def load_pairs(filename):
+    """
+    Load (source, target) pairs from a CSV file with two columns,
+    each holding a person's name or IMDB id. A header row is optional.
+    """
+    with open(filename, encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        pairs = [tuple(cell.strip() for cell in row[:2]) for row in reader if len(row) >= 2]
+    if pairs and pairs[0] == ("source", "target"):
+        pairs = pairs[1:]
+    return pairs
+
+
+def resolve(value):
+    """
+    Returns (person_id, status) for a person's IMDB id or name,
+    never prompting: ambiguous names are reported rather than resolved.
+    """
+    if value in degrees.people:
+        return value, "ok"
+    person_ids = degrees.names.get(value.lower(), set())
+    if len(person_ids) == 0:
+        return None, "not found"
+    elif len(person_ids) > 1:
+        return None, "ambiguous"
+    return next(iter(person_ids)), "ok"
+
+
+def answer(pair):
+    """
+    Returns a result dictionary for one (source, target) query.
+    """
+    source, target = pair
+    source_id, source_status = resolve(source)
+    target_id, target_status = resolve(target)
+    result = {
+        "source": source,
+        "target": target,
+        "source_id": source_id,
+        "target_id": target_id,
+        "status": source_status if source_status != "ok" else target_status,
+        "degrees": None,
+        "path": None
+    }
+    if result["status"] != "ok":
+        return result
+
+    path = shortest_path(source_id, target_id, bidirectional=True)
+    if path is None:
+        result["status"] = "not connected"
+    else:
+        result["degrees"] = len(path)
+        result["path"] = path
+    return result
+
+
+def load_worker(directory):
+    """
+    Make sure a worker process has the graph in memory. Forked workers
+    already share the parent's copy, so only spawned workers load it.
+    """
+    if not degrees.people:
+        load_data(directory, cache=True)
+
+
+def run_queries(pairs, directory, workers):
+    """
+    Yield results for `pairs` in order, fanning them out
+    across `workers` processes when more than one is requested.
+    """
+    if workers <= 1:
+        yield from map(answer, pairs)
+        return
+
+    # Forked workers inherit the loaded graph without copying it
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork" if "fork" in methods else None)
+    chunksize = max(1, len(pairs) // (workers * 16))
+    with context.Pool(workers, initializer=load_worker, initargs=(directory,)) as pool:
+        yield from pool.imap(answer, pairs, chunksize=chunksize)
+
+
+def write_results(results, filename):
+    """
+    Write query results as JSON lines or, for any other extension, CSV.
+    Returns the number of results written.
+    """
+    count = 0
+    with open(filename, "w", encoding="utf-8", newline="") as f:
+        if filename.endswith(".jsonl"):
+            for result in results:
+                f.write(json.dumps(result) + "\n")
+                count += 1
+        else:
+            writer = csv.DictWriter(f, fieldnames=FIELDS)
+            writer.writeheader()
+            for result in results:
+                if result["path"] is not None:
+                    result["path"] = " ".join(
+                        f"{movie_id}:{person_id}" for movie_id, person_id in result["path"]
+                    )
+                writer.writerow(result)
+                count += 1
+    return count
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+import csv
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import degrees
+
+# Shape of the synthetic graph: cast sizes follow a Pareto distribution,
+# and people are cast with Zipf-like popularity
+CAST_SHAPE = 1.5
+MAX_CAST = 500
+POPULARITY = 0.8
+STARS_PER_PERSON = 3
+
+FIRST_NAMES = ["Alex", "Sam", "Jordan", "Taylor", "Morgan", "Casey", "Riley", "Jamie", "Robin", "Quinn"]
+LAST_NAMES = ["Smith", "Jones", "Brown", "Garcia", "Miller", "Davis", "Wilson", "Moore", "Clark", "Lewis"]
+
+# Load configurations as (representation, whether to load from a snapshot)
+LOADS = [("dicts", False), ("compact", False), ("dicts", True), ("compact", True)]
+
+STRATEGIES = ["bfs", "bidirectional", "tree"]
+
+
+def main():
+    if len(sys.argv) not in [2, 3, 4]:
+        sys.exit("Usage: python benchmark.py edges [queries] [results.json]")
+    edges = int(sys.argv[1])
+    queries = int(sys.argv[2]) if len(sys.argv) >= 3 else 1000
+    output = sys.argv[3] if len(sys.argv) == 4 else None
+    if queries < 1:
+        sys.exit("Usage: python benchmark.py edges [queries] [results.json]")
+
+    directory = tempfile.mkdtemp(prefix="degrees-benchmark-")
+    try:
+        results = benchmark(directory, edges, queries)
+    finally:
+        shutil.rmtree(directory)
+
+    report = json.dumps(results, indent=2)
+    if output is None:
+        print(report)
+    else:
+        with open(output, "w") as f:
+            f.write(report + "\n")
+
+
+def generate(directory, edges, seed=0):
+    """
+    Write synthetic people.csv, movies.csv and stars.csv files
+    with about `edges` star memberships to `directory`.
+    Returns the number of people, movies and stars written.
+    """
+    rng = random.Random(seed)
+    person_count = max(2, edges // STARS_PER_PERSON)
+
+    # Cumulative Zipf weights make a few people star in most movies
+    cumulative = []
+    total = 0
+    for rank in range(1, person_count + 1):
+        total += rank ** -POPULARITY
+        cumulative.append(total)
+
+    with open(os.path.join(directory, "people.csv"), "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "name", "birth"])
+        for i in range(person_count):
+            name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {i % 997}"
+            writer.writerow([i + 1, name, rng.randint(1900, 2005)])
+
+    stars = 0
+    movie_count = 0
+    with open(os.path.join(directory, "movies.csv"), "w", encoding="utf-8", newline="") as movies_file, \
+            open(os.path.join(directory, "stars.csv"), "w", encoding="utf-8", newline="") as stars_file:
+        movies = csv.writer(movies_file)
+        movies.writerow(["id", "title", "year"])
+        cast = csv.writer(stars_file)
+        cast.writerow(["person_id", "movie_id"])
+        while stars < edges:
+            movie_count += 1
+            movies.writerow([movie_count, f"Movie {movie_count}", rng.randint(1920, 2020)])
+            size = min(MAX_CAST, int(rng.paretovariate(CAST_SHAPE)), edges - stars)
+            members = set(rng.choices(range(1, person_count + 1), cum_weights=cumulative, k=size))
+            for person_id in members:
+                cast.writerow([person_id, movie_count])
+            stars += len(members)
+
+    return person_count, movie_count, stars
+
+
+def unload():
+    """
+    Drop any data already loaded into `degrees`.
+    """
+    for table in (degrees.names, degrees.people, degrees.movies):
+        table.clear()
+    degrees.clear_index()
+
+
+def measure_load(directory, compact, cache, connection):
+    """
+    Load the data in a child process, sending back the load time
+    and the memory held by the loaded data.
+    """
+    unload()
+    start = time.perf_counter()
+    degrees.load_data(directory, cache=cache, compact=compact)
+    seconds = time.perf_counter() - start
+
+    # Trace a second load separately, since tracing slows loading down
+    unload()
+    tracemalloc.start()
+    degrees.load_data(directory, cache=cache, compact=compact)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    connection.send((seconds, memory))
+    connection.close()
+
+
+def run_isolated(target, *args):
+    """
+    Run `target(*args, connection)` in a child process and return what it sends.
+    """
+    context = multiprocessing.get_context()
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=target, args=(*args, sender))
+    process.start()
+    sender.close()
+    result = receiver.recv()
+    process.join()
+    return result
+
+
+def percentiles(samples):
+    """
+    Summarize a list of latencies in seconds as milliseconds.
+    """
+    samples = sorted(samples)
+
+    def at(fraction):
+        return samples[min(len(samples) - 1, int(fraction * len(samples)))] * 1000
+
+    return {
+        "count": len(samples),
+        "mean_ms": statistics.fmean(samples) * 1000,
+        "p50_ms": at(0.50),
+        "p90_ms": at(0.90),
+        "p99_ms": at(0.99),
+        "max_ms": samples[-1] * 1000
+    }
+
+
+def time_queries(pairs, strategy):
+    """
+    Returns per-query latencies for `pairs` under a search strategy:
+    one-sided breadth-first search, bidirectional search, or answers
+    from single-source search trees built ahead of time.
+    """
+    degrees.trees.clear()
+    if strategy == "tree":
+        for source in {source for source, _ in pairs}:
+            degrees.bacon_numbers(source)
+
+    latencies = []
+    for source, target in pairs:
+        start = time.perf_counter()
+        degrees.shortest_path(source, target, bidirectional=strategy == "bidirectional")
+        latencies.append(time.perf_counter() - start)
+    degrees.trees.clear()
+    return latencies
+
+
+def benchmark(directory, edges, queries, seed=0):
+    """
+    Generate a synthetic dataset in `directory` and return
+    load and query measurements for it.
+    """
+    start = time.perf_counter()
+    person_count, movie_count, stars = generate(directory, edges, seed)
+    results = {
+        "edges": stars,
+        "people": person_count,
+        "movies": movie_count,
+        "generate_s": time.perf_counter() - start,
+        "load": [],
+        "queries": {}
+    }
+
+    # Write a snapshot up front so cached loads measure reading it
+    degrees.load_data(directory, cache=True)
+    for representation, cache in LOADS:
+        seconds, memory = run_isolated(measure_load, directory, representation == "compact", cache)
+        results["load"].append({
+            "representation": representation,
+            "cache": cache,
+            "seconds": seconds,
+            "memory_bytes": memory
+        })
+
+    # Query a few sources many times, as batch jobs tend to
+    rng = random.Random(seed)
+    sources = rng.sample(degrees.person_ids, min(len(degrees.person_ids), 16))
+    pairs = [(rng.choice(sources), rng.choice(degrees.person_ids)) for _ in range(queries)]
+    connected = sum(degrees.connected(source, target) for source, target in pairs)
+    results["connected_fraction"] = connected / len(pairs) if pairs else 0
+    for strategy in STRATEGIES:
+        results["queries"][strategy] = percentiles(time_queries(pairs, strategy))
+
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,13 @@
+import bisect
 import csv
+import gc
+import itertools
+import mmap
+import os
+import struct
 import sys
+from array import array
+from collections import Counter, OrderedDict
 
 from util import Node, StackFrontier, QueueFrontier
 
@@ -12,10 +20,120 @@ people = {}
 # Maps movie_ids to a dictionary of: title, year, stars (a set of person_ids)
 movies = {}
 
+# Maps person_ids and movie_ids to compact integer indices, and back
+person_index = {}
+person_ids = []
+movie_index = {}
+movie_ids = []
 
-def load_data(directory):
+# Movies of person i are filmographies[filmography_offsets[i]:filmography_offsets[i + 1]],
+# and people in movie j are casts[cast_offsets[j]:cast_offsets[j + 1]]
+filmography_offsets = array("q")
+filmographies = array("i")
+cast_offsets = array("q")
+casts = array("i")
+
+# Co-stars of the person with index i are costars[offsets[i]:offsets[i + 1]]
+offsets = array("q")
+costars = array("i")
+
+# Connected component label of each person index, and size of each component
+components = array("i")
+component_sizes = array("q")
+
+# Lowercase names in sorted order with the person index of each,
+# for prefix search, and person indices by name trigram for fuzzy search
+sorted_names = []
+name_order = array("i")
+trigrams = {}
+
+# Least trigram similarity for a fuzzy name match to count
+FUZZY_THRESHOLD = 0.3
+
+# Most recently used single-source search trees, by source person index
+TREE_CACHE_SIZE = 16
+trees = OrderedDict()
+
+# Binary snapshot written next to the CSV files by load_data(cache=True),
+# with every section starting on an 8 byte boundary
+SNAPSHOT = "degrees.snapshot"
+SNAPSHOT_MAGIC = b"DEGSNAP5"
+SNAPSHOT_SECTIONS = 19
+SOURCES = ("people.csv", "movies.csv", "stars.csv")
+
+
+class Person():
+    """
+    Compact record of a person, read like the dictionaries in `people`.
+    """
+    __slots__ = ("name", "birth", "index")
+
+    def __init__(self, name, birth, index):
+        self.name = name
+        self.birth = birth
+        self.index = index
+
+    def __getitem__(self, key):
+        if key == "movies":
+            start, end = filmography_offsets[self.index], filmography_offsets[self.index + 1]
+            return {movie_ids[j] for j in filmographies[start:end]}
+        elif key in ("name", "birth"):
+            return getattr(self, key)
+        raise KeyError(key)
+
+
+class Movie():
+    """
+    Compact record of a movie, read like the dictionaries in `movies`.
+    """
+    __slots__ = ("title", "year", "index")
+
+    def __init__(self, title, year, index):
+        self.title = title
+        self.year = year
+        self.index = index
+
+    def __getitem__(self, key):
+        if key == "stars":
+            start, end = cast_offsets[self.index], cast_offsets[self.index + 1]
+            return {person_ids[i] for i in casts[start:end]}
+        elif key in ("title", "year"):
+            return getattr(self, key)
+        raise KeyError(key)
+
+
+def load_data(directory, cache=False, compact=False):
     """
     Load data from CSV files into memory.
+
+    If `cache`, reuse a binary snapshot of the data next to the CSV files
+    when it is still current, and write a fresh one when it is not.
+    If `compact`, store people and movies as slotted records backed
+    by the index arrays, which takes a fraction of the memory.
+    """
+    # Loading allocates millions of objects that all live on, so
+    # garbage collection passes during it would find nothing to free
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+        if not (cache and load_snapshot(directory, compact)):
+            if compact:
+                load_compact(directory)
+            else:
+                load_dicts(directory)
+
+            # Index names for prefix and fuzzy search
+            build_name_index()
+            if cache:
+                save_snapshot(directory)
+    finally:
+        if collecting:
+            gc.enable()
+
+
+def load_dicts(directory):
+    """
+    Load data from CSV files into dictionaries of sets, then index it.
     """
     # Load people
     with open(f"{directory}/people.csv", encoding="utf-8") as f:
@@ -51,6 +169,469 @@ def load_data(directory):
             except KeyError:
                 pass
 
+    # Index co-stars once so searches never rebuild neighbor sets
+    build_index()
+
+
+def load_compact(directory):
+    """
+    Load data from CSV files into compact records and index arrays
+    in a single streaming pass over each file.
+    """
+    clear_index()
+
+    # Load people, interning ids and the many repeated birth years
+    with open(f"{directory}/people.csv", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        columns = next(reader)
+        id_column, name_column, birth_column = (
+            columns.index("id"), columns.index("name"), columns.index("birth")
+        )
+        for row in reader:
+            person_id = sys.intern(row[id_column])
+            person_index[person_id] = len(person_ids)
+            people[person_id] = Person(row[name_column], sys.intern(row[birth_column]), len(person_ids))
+            add_name(row[name_column], person_id)
+            person_ids.append(person_id)
+
+    # Load movies
+    with open(f"{directory}/movies.csv", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        columns = next(reader)
+        id_column, title_column, year_column = (
+            columns.index("id"), columns.index("title"), columns.index("year")
+        )
+        for row in reader:
+            movie_id = sys.intern(row[id_column])
+            movie_index[movie_id] = len(movie_ids)
+            movies[movie_id] = Movie(row[title_column], sys.intern(row[year_column]), len(movie_ids))
+            movie_ids.append(movie_id)
+
+    # Load stars as parallel arrays of person and movie indices
+    star_people = array("i")
+    star_movies = array("i")
+    with open(f"{directory}/stars.csv", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        columns = next(reader)
+        person_column, movie_column = columns.index("person_id"), columns.index("movie_id")
+        for row in reader:
+            i = person_index.get(row[person_column])
+            j = movie_index.get(row[movie_column])
+            if i is not None and j is not None:
+                star_people.append(i)
+                star_movies.append(j)
+
+    index_memberships(star_people, star_movies)
+    index_costars()
+    index_components()
+
+
+def add_name(name, person_id):
+    """
+    Record `person_id` under `name` in `names`, as a tuple
+    rather than a set to keep the many unique names small.
+    """
+    key = name.lower()
+    names[key] = names.get(key, ()) + (person_id,)
+
+
+def clear_index():
+    """
+    Empty every index, ready to load a new dataset.
+    """
+    global filmography_offsets, filmographies, cast_offsets, casts
+    global offsets, costars, components, component_sizes
+
+    person_index.clear()
+    person_ids.clear()
+    movie_index.clear()
+    movie_ids.clear()
+
+    # Replace rather than empty the index arrays, since after loading
+    # a snapshot they are read-only views onto the mapped file
+    filmography_offsets, filmographies = array("q"), array("i")
+    cast_offsets, casts = array("q"), array("i")
+    offsets, costars = array("q"), array("i")
+    components, component_sizes = array("i"), array("q")
+    trees.clear()
+
+
+def build_index():
+    """
+    Build the membership and co-star indices from `people` and `movies`.
+    """
+    clear_index()
+
+    for person_id in people:
+        person_index[person_id] = len(person_ids)
+        person_ids.append(person_id)
+    for movie_id in movies:
+        movie_index[movie_id] = len(movie_ids)
+        movie_ids.append(movie_id)
+
+    star_people = array("i")
+    star_movies = array("i")
+    for i, person_id in enumerate(person_ids):
+        for movie_id in people[person_id]["movies"]:
+            star_people.append(i)
+            star_movies.append(movie_index[movie_id])
+
+    index_memberships(star_people, star_movies)
+    index_costars()
+    index_components()
+
+
+def group(keys, values, count):
+    """
+    Returns (starts, grouped) arrays, such that the values paired with
+    key k are grouped[starts[k]:starts[k + 1]], using a counting sort.
+    """
+    starts = array("q", [0]) * (count + 1)
+    for k in keys:
+        starts[k + 1] += 1
+    for k in range(count):
+        starts[k + 1] += starts[k]
+
+    grouped = array("i", [0]) * len(values)
+    position = starts[:-1]
+    for k, value in zip(keys, values):
+        grouped[position[k]] = value
+        position[k] += 1
+    return starts, grouped
+
+
+def index_memberships(star_people, star_movies):
+    """
+    Build the filmography and cast indices from (person, movie) index pairs.
+    """
+    starts, grouped = group(star_people, star_movies, len(person_ids))
+    filmography_offsets.extend(starts)
+    filmographies.extend(grouped)
+
+    starts, grouped = group(star_movies, star_people, len(movie_ids))
+    cast_offsets.extend(starts)
+    casts.extend(grouped)
+
+
+def index_costars():
+    """
+    Build the person to co-star adjacency index from the membership indices.
+    """
+    offsets.append(0)
+    for i in range(len(person_ids)):
+        neighbors = set()
+        for j in filmographies[filmography_offsets[i]:filmography_offsets[i + 1]]:
+            neighbors.update(casts[cast_offsets[j]:cast_offsets[j + 1]])
+        neighbors.discard(i)
+        costars.extend(neighbors)
+        offsets.append(len(costars))
+
+
+def name_trigrams(name):
+    """
+    Returns the set of three-character substrings of a padded, lowercase name.
+    """
+    padded = f"  {name.lower()} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def build_name_index():
+    """
+    Build the prefix and trigram name indices from `people`.
+    """
+    global name_order
+
+    # A stable sort leaves people with the same name in index order
+    lowered = [people[person_id]["name"].lower() for person_id in person_ids]
+    order = sorted(range(len(lowered)), key=lowered.__getitem__)
+    sorted_names[:] = [lowered[i] for i in order]
+    name_order = array("i", order)
+
+    trigrams.clear()
+    for i, name in enumerate(lowered):
+        for trigram in name_trigrams(name):
+            if trigram not in trigrams:
+                trigrams[trigram] = array("i")
+            trigrams[trigram].append(i)
+
+
+def popularity(i):
+    """
+    Returns a sort key ranking the person with index i first
+    the more movies they starred in, then the earlier they were born.
+    """
+    movie_count = filmography_offsets[i + 1] - filmography_offsets[i]
+    birth = people[person_ids[i]]["birth"]
+    return (-movie_count, int(birth) if birth.isdigit() else float("inf"))
+
+
+def search_names(query, limit=10):
+    """
+    Returns up to `limit` person_ids whose names best match `query`.
+
+    Exact matches rank first, then names starting with the query, then
+    names sharing enough trigrams with it. Ties go to people with more
+    movies, then to people born earlier.
+    """
+    query = query.lower().strip()
+    if not query:
+        return []
+    scores = dict()
+
+    # Names starting with the query are adjacent in sorted order
+    start = bisect.bisect_left(sorted_names, query)
+    for k in range(start, len(sorted_names)):
+        name = sorted_names[k]
+        if not name.startswith(query):
+            break
+        scores[name_order[k]] = 2 if name == query else 1
+
+    # Rate other names by the Dice coefficient of their trigrams
+    query_trigrams = name_trigrams(query)
+    shared = Counter()
+    for trigram in query_trigrams:
+        shared.update(trigrams.get(trigram, ()))
+    for i, count in shared.items():
+        if i in scores:
+            continue
+        name = people[person_ids[i]]["name"]
+        similarity = 2 * count / (len(query_trigrams) + len(name_trigrams(name)))
+        if similarity >= FUZZY_THRESHOLD:
+            scores[i] = similarity
+
+    ranked = sorted(scores, key=lambda i: (-scores[i], popularity(i)))
+    return [person_ids[i] for i in ranked[:limit]]
+
+
+def index_components():
+    """
+    Label every person with their connected component, joining
+    everyone in each cast with a union-find over person indices.
+    """
+    root = array("i", range(len(person_ids)))
+
+    def find(i):
+        while root[i] != i:
+            root[i] = root[root[i]]
+            i = root[i]
+        return i
+
+    for j in range(len(movie_ids)):
+        cast = casts[cast_offsets[j]:cast_offsets[j + 1]]
+        if len(cast) < 2:
+            continue
+        first = find(cast[0])
+        for i in cast[1:]:
+            other = find(i)
+            if other != first:
+                root[other] = first
+
+    # Number components densely in order of first appearance
+    labels = {}
+    for i in range(len(person_ids)):
+        label = labels.setdefault(find(i), len(labels))
+        if label == len(component_sizes):
+            component_sizes.append(0)
+        components.append(label)
+        component_sizes[label] += 1
+
+
+def component_size(person_id):
+    """
+    Returns the number of people connected to a person, including themselves.
+    """
+    return component_sizes[components[person_index[person_id]]]
+
+
+def connected(source, target):
+    """
+    Returns whether any path connects the source to the target.
+    """
+    return components[person_index[source]] == components[person_index[target]]
+
+
+def snapshot_signature(directory):
+    """
+    Returns the (mtime, size) of each source CSV file,
+    so a snapshot can tell whether it is out of date.
+    """
+    signature = []
+    for filename in SOURCES:
+        stat = os.stat(os.path.join(directory, filename))
+        signature.extend((stat.st_mtime_ns, stat.st_size))
+    return signature
+
+
+def save_snapshot(directory):
+    """
+    Write the loaded data and indices to a binary snapshot file.
+    """
+    sections = [
+        "\0".join(person_ids).encode("utf-8"),
+        "\0".join(people[person_id]["name"] for person_id in person_ids).encode("utf-8"),
+        "\0".join(people[person_id]["birth"] for person_id in person_ids).encode("utf-8"),
+        "\0".join(movie_ids).encode("utf-8"),
+        "\0".join(movies[movie_id]["title"] for movie_id in movie_ids).encode("utf-8"),
+        "\0".join(movies[movie_id]["year"] for movie_id in movie_ids).encode("utf-8"),
+        filmography_offsets.tobytes(),
+        filmographies.tobytes(),
+        cast_offsets.tobytes(),
+        casts.tobytes(),
+        offsets.tobytes(),
+        costars.tobytes(),
+        components.tobytes(),
+        component_sizes.tobytes(),
+        "\0".join(sorted_names).encode("utf-8"),
+        "\0".join(trigrams).encode("utf-8"),
+        name_order.tobytes(),
+        array("q", itertools.accumulate((len(trigrams[trigram]) for trigram in trigrams), initial=0)).tobytes(),
+        b"".join(trigrams[trigram].tobytes() for trigram in trigrams),
+    ]
+    header = struct.pack(
+        f"=8s{len(SOURCES) * 2}q3q{len(sections)}q",
+        SNAPSHOT_MAGIC, *snapshot_signature(directory),
+        len(person_ids), len(movie_ids), len(sections),
+        *(len(section) for section in sections)
+    )
+
+    # Write to a temporary file first so readers never see half a snapshot
+    filename = os.path.join(directory, SNAPSHOT)
+    with open(f"{filename}.tmp", "wb") as f:
+        f.write(header)
+        for section in sections:
+            f.write(section)
+            f.write(b"\0" * (-len(section) % 8))
+    os.replace(f"{filename}.tmp", filename)
+
+
+def load_snapshot(directory, compact=False):
+    """
+    Load data from a binary snapshot file into memory, as compact
+    records if `compact`. Returns False, loading nothing,
+    if there is no current snapshot.
+
+    The index arrays become views straight onto the mapped file,
+    which stays mapped for as long as they are in use.
+    """
+    global filmography_offsets, filmographies, cast_offsets, casts
+    global offsets, costars, components, component_sizes, name_order
+
+    filename = os.path.join(directory, SNAPSHOT)
+    try:
+        f = open(filename, "rb")
+    except FileNotFoundError:
+        return False
+
+    # A file too short for the header is no snapshot, and an empty one
+    # cannot even be mapped
+    prefix = struct.Struct(f"=8s{len(SOURCES) * 2}q3q")
+    with f:
+        if os.fstat(f.fileno()).st_size < prefix.size:
+            return False
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    # Check the snapshot was written for the current CSV files
+    if data[:8] != SNAPSHOT_MAGIC:
+        data.close()
+        return False
+    _, *fields = prefix.unpack_from(data)
+    signature = fields[:len(SOURCES) * 2]
+    person_count, movie_count, section_count = fields[len(SOURCES) * 2:]
+    if signature != snapshot_signature(directory):
+        data.close()
+        return False
+
+    # Find where each section starts, treating a truncated file as stale
+    try:
+        lengths = struct.unpack_from(f"={section_count}q", data, prefix.size)
+    except struct.error:
+        data.close()
+        return False
+    bounds = []
+    start = prefix.size + 8 * section_count
+    for length in lengths:
+        if length < 0 or start + length > len(data):
+            data.close()
+            return False
+        bounds.append((start, start + length))
+        start += length + (-length % 8)
+    if len(bounds) != SNAPSHOT_SECTIONS:
+        data.close()
+        return False
+
+    # Slice the mapped file into its sections without copying them
+    view = memoryview(data)
+    (ids, person_names, births, movie_id_data, titles, years, *index_data,
+     name_data, trigram_data, order_data, trigram_offset_data, posting_data) = (
+        view[start:end] for start, end in bounds
+    )
+
+    def strings(section, count):
+        return str(section, "utf-8").split("\0") if count else []
+
+    clear_index()
+    (filmography_offsets, filmographies, cast_offsets, casts,
+     offsets, costars, components, component_sizes) = (
+        section.cast(typecode)
+        for section, typecode in zip(index_data, "qiqiqiiq")
+    )
+
+    # Name indices, with each trigram's people a view onto the file
+    sorted_names[:] = strings(name_data, person_count)
+    name_order = order_data.cast("i")
+    trigram_offsets = trigram_offset_data.cast("q")
+    postings = posting_data.cast("i")
+    trigrams.clear()
+    trigrams.update(zip(
+        strings(trigram_data, len(trigram_offsets) - 1),
+        map(postings.__getitem__, map(slice, trigram_offsets[:-1], trigram_offsets[1:]))
+    ))
+
+    # Build records and indices with map and zip, keeping per-record
+    # work out of Python loops
+    person_ids.extend(strings(ids, person_count))
+    movie_ids.extend(strings(movie_id_data, movie_count))
+    person_names = strings(person_names, person_count)
+    births = map(sys.intern, strings(births, person_count))
+    person_index.update(zip(person_ids, itertools.count()))
+    if compact:
+        people.update(zip(person_ids, map(Person, person_names, births, itertools.count())))
+    else:
+        people.update(
+            (person_id, {
+                "name": name,
+                "birth": birth,
+                "movies": set(map(movie_ids.__getitem__, filmographies[start:end]))
+            })
+            for person_id, name, birth, start, end in zip(
+                person_ids, person_names, births, filmography_offsets, filmography_offsets[1:]
+            )
+        )
+    for person_id, key in zip(person_ids, map(str.lower, person_names)):
+        if compact:
+            names[key] = names.get(key, ()) + (person_id,)
+        else:
+            names.setdefault(key, set()).add(person_id)
+
+    years = map(sys.intern, strings(years, movie_count))
+    movie_index.update(zip(movie_ids, itertools.count()))
+    titles = strings(titles, movie_count)
+    if compact:
+        movies.update(zip(movie_ids, map(Movie, titles, years, itertools.count())))
+    else:
+        movies.update(
+            (movie_id, {
+                "title": title,
+                "year": year,
+                "stars": set(map(person_ids.__getitem__, casts[start:end]))
+            })
+            for movie_id, title, year, start, end in zip(
+                movie_ids, titles, years, cast_offsets, cast_offsets[1:]
+            )
+        )
+
+    return True
+
 
 def main():
     if len(sys.argv) > 2:
@@ -59,7 +640,7 @@ def main():
 
     # Load data from files into memory
     print("Loading data...")
-    load_data(directory)
+    load_data(directory, cache=True)
     print("Data loaded.")
 
     source = person_id_for_name(input("Name: "))
@@ -70,7 +651,7 @@ def main():
     if target is None:
         sys.exit("Person not found.")
 
-    path = shortest_path(source, target)
+    path = shortest_path(source, target, bidirectional=True)
 
     if path is None:
         print("Not connected.")
@@ -85,55 +666,354 @@ def main():
             print(f"{i + 1}: {person1} and {person2} starred in {movie}")
 
 
-def shortest_path(source, target):
-    
-    # Define potential start nodes
+def shortest_path(source, target, bidirectional=False):
+    """
+    Returns the shortest list of (movie_id, person_id) pairs
+    that connect the source to the target.
+
+    If no possible path, returns None.
+    If `bidirectional`, searches from both ends at once.
+    """
+    if source == target:
+        return []
+    start = person_index[source]
+    goal = person_index[target]
+
+    # People in different components are never connected
+    if components[start] != components[goal]:
+        return None
+
+    # Answer from a cached search tree rooted at either person
+    if start in trees:
+        trees.move_to_end(start)
+        return path_from_tree(trees[start], goal)
+    if goal in trees:
+        trees.move_to_end(goal)
+        chain = tree_chain(trees[goal], start)
+        return None if chain is None else path_for(chain[::-1])
+
+    if bidirectional:
+        return bidirectional_path(source, target)
+
+    # Define start node
     frontier = QueueFrontier()      # StackFrontier() or QueueFrontier()
-    for start in neighbors_for_person(source):
-            frontier.add(Node(state = start, parent = None, action = None))
-    
+    frontier.add(Node(state = start, parent = None, action = None))
+
     # Initiate explored set
-    explored = set()
-    
+    explored = {start}
+
     # Solve problem
-    while True:
-        
-        # Break if no more options
-        if frontier.empty():
-            return None
-        
+    while not frontier.empty():
+
         # Select node from frontier
         node = frontier.remove()
-        explored.add(node.state)
-        
-        # Test for goal node
-        path = []
-        def goal_test(node):
-            if node.state[1] == target:
-                path.append(node.state)
-                while node.parent != None:
-                    path.append(node.parent.state)
-                    node = node.parent
-                path.reverse()
-                return True
-            return False
-        if goal_test(node):
-            return path
-        
-        # Add new possible nodes to frontier
-        for link in neighbors_for_person(node.state[1]):
-            if not frontier.contains_state(link) and link not in explored:
-                new_node = Node(state = link, parent = node, action = None)
-                if goal_test(new_node):
-                    return path
-                frontier.add(new_node)
+
+        # Add new possible nodes to frontier, testing each as it is found
+        for link in costars[offsets[node.state]:offsets[node.state + 1]]:
+            if link in explored:
+                continue
+            explored.add(link)
+            new_node = Node(state = link, parent = node, action = None)
+            if link == goal:
+                chain = []
+                while new_node is not None:
+                    chain.append(new_node.state)
+                    new_node = new_node.parent
+                chain.reverse()
+                return path_for(chain)
+            frontier.add(new_node)
+
+    # Break if no more options
+    return None
+
+
+def bacon_numbers(source):
+    """
+    Returns (distance, parent) arrays over person indices for a single
+    breadth-first search from the source. Unreachable people have
+    distance -1; the source and unreachable people have parent -1.
+
+    The most recently used trees are cached, and shortest_path
+    answers any query touching a cached source from its tree.
+    """
+    start = person_index[source]
+    if start in trees:
+        trees.move_to_end(start)
+        return trees[start]
+
+    distance = array("i", [-1]) * len(person_ids)
+    parent = array("i", [-1]) * len(person_ids)
+    distance[start] = 0
+
+    # Expand the search one full layer at a time
+    layer = [start]
+    depth = 0
+    while layer:
+        depth += 1
+        next_layer = []
+        for i in layer:
+            for neighbor in costars[offsets[i]:offsets[i + 1]]:
+                if distance[neighbor] == -1:
+                    distance[neighbor] = depth
+                    parent[neighbor] = i
+                    next_layer.append(neighbor)
+        layer = next_layer
+
+    # Evict the least recently used tree once the cache is full
+    trees[start] = (distance, parent)
+    if len(trees) > TREE_CACHE_SIZE:
+        trees.popitem(last=False)
+    return trees[start]
+
+
+def tree_chain(tree, goal):
+    """
+    Returns the person indices from a tree's source to `goal`,
+    or None if `goal` is unreachable from it.
+    """
+    distance, parent = tree
+    if distance[goal] == -1:
+        return None
+    chain = [goal]
+    while parent[chain[-1]] != -1:
+        chain.append(parent[chain[-1]])
+    chain.reverse()
+    return chain
 
 
-def person_id_for_name(name):
+def path_from_tree(tree, goal):
+    """
+    Returns the (movie_id, person_id) path from a tree's source to `goal`,
+    or None if `goal` is unreachable from it.
+    """
+    chain = tree_chain(tree, goal)
+    return None if chain is None else path_for(chain)
+
+
+def bidirectional_path(source, target):
+    """
+    Returns the shortest list of (movie_id, person_id) pairs
+    that connect the source to the target, growing breadth-first
+    frontiers from both people and joining them in the middle.
+
+    If no possible path, returns None.
+    """
+    if source == target:
+        return []
+    if not connected(source, target):
+        return None
+
+    # Map each reached person index to its neighbor one step
+    # closer to the side it was reached from
+    forward = {person_index[source]: None}
+    backward = {person_index[target]: None}
+    forward_layer = list(forward)
+    backward_layer = list(backward)
+
+    while forward_layer and backward_layer:
+
+        # Always expand the smaller frontier by one full layer
+        expand_forward = len(forward_layer) <= len(backward_layer)
+        if expand_forward:
+            layer, reached, other = forward_layer, forward, backward
+        else:
+            layer, reached, other = backward_layer, backward, forward
+
+        next_layer = []
+        for i in layer:
+            for neighbor in costars[offsets[i]:offsets[i + 1]]:
+                if neighbor in reached:
+                    continue
+                reached[neighbor] = i
+
+                # The frontiers meet, so no shorter path can exist
+                if neighbor in other:
+                    return path_for(join_chains(forward, backward, neighbor))
+                next_layer.append(neighbor)
+
+        if expand_forward:
+            forward_layer = next_layer
+        else:
+            backward_layer = next_layer
+
+    return None
+
+
+def join_chains(forward, backward, meeting):
+    """
+    Returns the person indices from source to target through `meeting`,
+    given the parent links recorded by both halves of a bidirectional search.
+    """
+    chain = []
+    i = meeting
+    while i is not None:
+        chain.append(i)
+        i = forward[i]
+    chain.reverse()
+
+    i = backward[meeting]
+    while i is not None:
+        chain.append(i)
+        i = backward[i]
+
+    return chain
+
+
+def path_for(chain):
+    """
+    Returns the (movie_id, person_id) pairs for a chain of person indices,
+    recovering a movie shared by each consecutive pair of people.
+    """
+    return [
+        (shared_movies(i, j)[0], person_ids[j])
+        for i, j in zip(chain, chain[1:])
+    ]
+
+
+def shared_movies(i, j):
+    """
+    Returns the movie_ids of the movies both person indices i and j starred in.
+    """
+    shared = (
+        set(filmographies[filmography_offsets[i]:filmography_offsets[i + 1]])
+        .intersection(filmographies[filmography_offsets[j]:filmography_offsets[j + 1]])
+    )
+    return [movie_ids[movie] for movie in sorted(shared)]
+
+
+def search_layers(start, goal):
+    """
+    Returns the distance from the person index `start` of every person
+    found by a breadth-first search that stops as soon as it reaches
+    `goal`, or None if `goal` cannot be reached.
+    """
+    distance = {start: 0}
+    layer = [start]
+    while layer:
+        next_layer = []
+        for i in layer:
+            for neighbor in costars[offsets[i]:offsets[i + 1]]:
+                if neighbor in distance:
+                    continue
+                distance[neighbor] = distance[i] + 1
+
+                # Every person one step closer than the goal is known by now
+                if neighbor == goal:
+                    return distance
+                next_layer.append(neighbor)
+        layer = next_layer
+    return None
+
+
+def predecessors(distance, i):
+    """
+    Returns the co-stars of person index i one step closer
+    to the start of the search that produced `distance`.
+    """
+    return [
+        neighbor for neighbor in costars[offsets[i]:offsets[i + 1]]
+        if distance.get(neighbor) == distance[i] - 1
+    ]
+
+
+def all_shortest_paths(source, target, k=None, all_movies=False):
+    """
+    Yields every shortest list of (movie_id, person_id) pairs that
+    connect the source to the target, or only the first `k` of them.
+
+    Paths are found lazily by walking back from the target over the
+    layers of a single breadth-first search, so only the current path
+    is held in memory. Paths differ in the people they pass through;
+    if `all_movies`, paths through the same people in different
+    shared movies are yielded as well.
+    """
+    if source == target:
+        yield []
+        return
+    if not connected(source, target):
+        return
+    start = person_index[source]
+    goal = person_index[target]
+    distance = search_layers(start, goal)
+    if distance is None:
+        return
+
+    paths = chains_to(distance, start, goal)
+    if all_movies:
+        paths = (
+            list(path) for chain in paths
+            for path in itertools.product(*(
+                [(movie_id, person_ids[j]) for movie_id in shared_movies(i, j)]
+                for i, j in zip(chain, chain[1:])
+            ))
+        )
+    else:
+        paths = map(path_for, paths)
+    yield from itertools.islice(paths, k)
+
+
+def chains_to(distance, start, goal):
+    """
+    Yields every chain of person indices from `start` to `goal`
+    along the layers recorded in `distance`.
+    """
+    # Depth-first over predecessors, keeping one iterator per step back
+    chain = [goal]
+    stack = [iter(predecessors(distance, goal))]
+    while stack:
+        i = next(stack[-1], None)
+        if i is None:
+            stack.pop()
+            chain.pop()
+        elif i == start:
+            yield [start] + chain[::-1]
+        else:
+            chain.append(i)
+            stack.append(iter(predecessors(distance, i)))
+
+
+def count_shortest_paths(source, target):
+    """
+    Returns the number of shortest paths, as sequences of people,
+    that connect the source to the target, without listing them.
+    """
+    if source == target:
+        return 1
+    if not connected(source, target):
+        return 0
+    start = person_index[source]
+    goal = person_index[target]
+    distance = search_layers(start, goal)
+    if distance is None:
+        return 0
+
+    # Collect the people on some shortest path, layer by layer back from the goal
+    layers = [[goal]]
+    while layers[-1] != [start]:
+        layers.append(sorted({
+            j for i in layers[-1] for j in predecessors(distance, i)
+        }))
+
+    # Count paths forwards from the start, one layer at a time
+    counts = {start: 1}
+    for layer in reversed(layers[:-1]):
+        for i in layer:
+            counts[i] = sum(counts.get(j, 0) for j in predecessors(distance, i))
+    return counts[goal]
+
+
+def person_id_for_name(name, interactive=True):
     """
     Returns the IMDB id for a person's name,
     resolving ambiguities as needed.
+
+    If not `interactive`, returns the best match from search_names
+    instead of prompting, or None if nothing matches closely enough.
     """
+    if not interactive:
+        candidates = search_names(name, limit=1)
+        return candidates[0] if candidates else None
+
     person_ids = list(names.get(name.lower(), set()))
     if len(person_ids) == 0:
         return None
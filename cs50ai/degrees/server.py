@@ -0,0 +1,180 @@
+import asyncio
+import bisect
+import json
+import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+from batch import answer
+from degrees import load_data
+
+# Number of answered (source, target) queries kept in memory
+CACHE_SIZE = 10000
+
+# Upper bounds, in milliseconds, of the request latency histogram buckets
+BUCKETS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, float("inf")]
+
+REASONS = {
+    200: "OK", 400: "Bad Request", 404: "Not Found",
+    405: "Method Not Allowed", 414: "URI Too Long",
+    431: "Request Header Fields Too Large", 500: "Internal Server Error"
+}
+
+
+class Server():
+
+    def __init__(self):
+
+        # Answered queries, least recently used first
+        self.cache = OrderedDict()
+
+        # Queries being searched for right now, shared by every
+        # request that asks for the same pair in the meantime
+        self.pending = dict()
+
+        # Searches share the module level graph and search tree cache,
+        # so they run one at a time off the event loop
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+        self.requests = 0
+        self.hits = 0
+        self.histogram = [0] * len(BUCKETS)
+
+    async def query(self, source, target):
+        """
+        Returns the result for a (source, target) query, from the cache,
+        from an identical search already running, or from a new search.
+        """
+        key = (source, target)
+        if key in self.cache:
+            self.hits += 1
+            self.cache.move_to_end(key)
+            return self.cache[key]
+
+        if key not in self.pending:
+            loop = asyncio.get_running_loop()
+            self.pending[key] = loop.run_in_executor(self.executor, answer, key)
+        else:
+            self.hits += 1
+        try:
+            result = await asyncio.shield(self.pending[key])
+        finally:
+            self.pending.pop(key, None)
+
+        # Evict the least recently used result once the cache is full
+        self.cache[key] = result
+        if len(self.cache) > CACHE_SIZE:
+            self.cache.popitem(last=False)
+        return result
+
+    def stats(self):
+        """
+        Returns request counts and the latency histogram.
+        """
+        return {
+            "requests": self.requests,
+            "cache_hits": self.hits,
+            "cached": len(self.cache),
+            "latency_ms": [
+                {"le": bound if bound != float("inf") else "inf", "count": count}
+                for bound, count in zip(BUCKETS, self.histogram)
+            ]
+        }
+
+    async def route(self, method, target):
+        """
+        Returns (status, body) for a request.
+        """
+        if method != "GET":
+            return 405, {"error": "only GET is supported"}
+        url = urlsplit(target)
+        if url.path == "/stats":
+            return 200, self.stats()
+        if url.path != "/path":
+            return 404, {"error": f"no route for {url.path}"}
+
+        params = parse_qs(url.query)
+        if "source" not in params or "target" not in params:
+            return 400, {"error": "source and target are required"}
+        return 200, await self.query(params["source"][0], params["target"][0])
+
+    async def respond(self, reader):
+        """
+        Returns (status, body) for the request read from `reader`.
+        """
+        # Lines longer than the stream limit raise ValueError
+        try:
+            request_line = await reader.readline()
+        except ValueError:
+            return 414, {"error": "request line too long"}
+        try:
+            while (await reader.readline()).strip():
+                pass
+        except ValueError:
+            return 431, {"error": "header line too long"}
+
+        try:
+            method, target, _ = request_line.decode("latin-1").split()
+        except ValueError:
+            return 400, {"error": "malformed request"}
+        try:
+            return await self.route(method, target)
+        except Exception as error:
+            return 500, {"error": f"{type(error).__name__}: {error}"}
+
+    async def handle(self, reader, writer):
+        """
+        Answer a single HTTP request, then close the connection.
+        """
+        start = time.perf_counter()
+        try:
+            status, body = await self.respond(reader)
+
+            payload = json.dumps(body).encode("utf-8")
+            writer.write(
+                f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                "Content-Type: application/json\r\n"
+                f"Content-Length: {len(payload)}\r\n"
+                "Connection: close\r\n\r\n".encode("latin-1") + payload
+            )
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+            # Record latency in the first bucket it fits in
+            elapsed = (time.perf_counter() - start) * 1000
+            self.requests += 1
+            self.histogram[bisect.bisect_left(BUCKETS, elapsed)] += 1
+
+
+async def serve(port):
+    server = Server()
+    listener = await asyncio.start_server(server.handle, "127.0.0.1", port)
+    print(f"Listening on http://127.0.0.1:{port}")
+    async with listener:
+        await listener.serve_forever()
+
+
+def main():
+    if len(sys.argv) not in [2, 3]:
+        sys.exit("Usage: python server.py directory [port]")
+    directory = sys.argv[1]
+    port = int(sys.argv[2]) if len(sys.argv) == 3 else 8000
+
+    # Load data from files into memory once for every request
+    print("Loading data...")
+    load_data(directory, cache=True)
+    print("Data loaded.")
+
+    try:
+        asyncio.run(serve(port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
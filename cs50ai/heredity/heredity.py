@@ -1,6 +1,11 @@
 import csv
+import heapq
 import itertools
+import math
+import operator
+import random
 import sys
+from concurrent.futures import ProcessPoolExecutor
 
 PROBS = {
 
@@ -36,16 +41,72 @@ PROBS = {
     "mutation": 0.01
 }
 
+# Possible numbers of copies of the gene
+GENES = (0, 1, 2)
+
+# Gene assignments scored together when enumerating them all, and
+# parts the assignments are split into for each worker process
+BATCH = 4096
+PARTS_PER_WORKER = 4
+
+# Samples each chain of a sampling method draws by default, and the
+# number of batches they are split into to estimate standard errors
+SAMPLES = 20000
+BATCHES = 20
+
+# Gibbs sampling sweeps discarded while a chain settles
+BURN_IN = 200
+
 
 def main():
 
     # Check for proper usage
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python heredity.py data.csv")
+    if len(sys.argv) not in [2, 3, 4, 5]:
+        sys.exit("Usage: python heredity.py data.csv [method] [workers|samples] [chains]")
     people = load_data(sys.argv[1])
 
-    # Keep track of gene and trait probabilities for each person
-    probabilities = {
+    # Compute gene and trait probabilities for each person, exactly or
+    # by sampling with the standard error of each estimate
+    sampling = {
+        "weighting": weighting_batches,
+        "gibbs": gibbs_batches
+    }
+    usage = "Methods: eliminate, enumerate [workers], weighting|gibbs [samples] [chains]"
+    method = sys.argv[2] if len(sys.argv) >= 3 else "eliminate"
+    try:
+        options = [int(option) for option in sys.argv[3:]]
+    except ValueError:
+        sys.exit(usage)
+    errors = None
+    if method == "eliminate" and not options:
+        probabilities = eliminate_probabilities(people)
+    elif method == "enumerate" and len(options) <= 1 and all(option >= 1 for option in options):
+        probabilities = enumerate_probabilities(people, *options)
+    elif method in sampling and all(option >= 1 for option in options):
+        probabilities, errors, effective = sample_probabilities(people, sampling[method], *options)
+    else:
+        sys.exit(usage)
+
+    # Print results
+    for person in people:
+        print(f"{person}:")
+        for field in probabilities[person]:
+            print(f"  {field.capitalize()}:")
+            for value in probabilities[person][field]:
+                p = probabilities[person][field][value]
+                if errors is None:
+                    print(f"    {value}: {p:.4f}")
+                else:
+                    print(f"    {value}: {p:.4f} ± {errors[person][field][value]:.4f}")
+    if errors is not None:
+        print(f"Effective sample size: {effective:.0f}")
+
+
+def empty_probabilities(people):
+    """
+    Return a gene and trait probability table of zeros for each person.
+    """
+    return {
         person: {
             "gene": {
                 2: 0,
@@ -60,38 +121,560 @@ def main():
         for person in people
     }
 
-    # Loop over all sets of people who might have the trait
-    names = set(people)
-    for have_trait in powerset(names):
 
-        # Check if current set of people violates known information
-        fails_evidence = any(
-            (people[person]["trait"] is not None and
-             people[person]["trait"] != (person in have_trait))
+def enumerate_probabilities(people, workers=1):
+    """
+    Return gene and trait probabilities for each person by summing the
+    joint probability of every possible assignment of genes.
+
+    Known traits are fixed rather than enumerated, and unknown traits
+    are summed out, so only gene assignments are looped over. With more
+    than one worker, the assignments are split into parts summed in
+    separate processes.
+    """
+    if workers == 1:
+        partials = [enumerate_part(people, 0, 1)]
+    else:
+
+        # Several parts per worker even out parts that finish early, and
+        # an odd number of parts keeps them from lining up with the bits
+        # of the masks, which would leave some parts far bigger
+        parts = workers * PARTS_PER_WORKER + 1
+        with ProcessPoolExecutor(workers) as executor:
+            partials = list(executor.map(
+                enumerate_part, itertools.repeat(people, parts), range(parts), itertools.repeat(parts, parts)
+            ))
+
+    # Add up the gene probabilities from every part
+    probabilities = empty_probabilities(people)
+    for partial in partials:
+        for person in people:
+            for value in GENES:
+                probabilities[person]["gene"][value] += partial[person]["gene"][value]
+
+    add_traits(people, probabilities)
+
+    # Ensure probabilities sum to 1
+    normalize(probabilities)
+    return probabilities
+
+
+def enumerate_part(people, part, parts):
+    """
+    Return the unnormalized gene probabilities for each person summed
+    over one of `parts` interleaved parts of the gene assignments.
+    """
+    probabilities = empty_probabilities(people)
+    names = list(people)
+    traits = {person: people[person]["trait"] for person in names}
+
+    # Bitmasks of the people who could have each number of genes given
+    # their known traits, and of those who cannot have none
+    may_have = {value: 0 for value in GENES}
+    for i, person in enumerate(names):
+        for value in GENES:
+            if traits[person] is None or PROBS["trait"][value][traits[person]]:
+                may_have[value] |= 1 << i
+    needs_gene = ((1 << len(names)) - 1) & ~may_have[0]
+
+    # Score gene assignments a batch at a time as they are generated
+    assignments = gene_assignments(may_have[1], may_have[2], needs_gene, part, parts)
+    while True:
+        batch = list(itertools.islice(assignments, BATCH))
+        if not batch:
+            break
+        ones, twos = zip(*batch)
+        genes = {
+            person: list(map(
+                operator.add, bits(ones, i), map(operator.lshift, bits(twos, i), itertools.repeat(1))
+            ))
+            for i, person in enumerate(names)
+        }
+        known = {
+            person: None if traits[person] is None else [int(traits[person])] * len(batch)
             for person in names
-        )
-        if fails_evidence:
-            continue
+        }
+        p = joint_probabilities(people, genes, known)
 
-        # Loop over all sets of people who might have the gene
-        for one_gene in powerset(names):
-            for two_genes in powerset(names - one_gene):
+        # Update gene probabilities with the joint probabilities
+        for person in names:
+            for value in GENES:
+                matches = map(operator.eq, genes[person], itertools.repeat(value))
+                probabilities[person]["gene"][value] += sum(itertools.compress(p, matches))
 
-                # Update probabilities with new joint probability
-                p = joint_probability(people, one_gene, two_genes, have_trait)
-                update(probabilities, one_gene, two_genes, have_trait, p)
+    return probabilities
+
+
+def gene_assignments(may_one, may_two, needs_gene, part=0, parts=1):
+    """
+    Yield (one_gene, two_genes) pairs of bitmasks of people, for every
+    way of giving one gene only to people in `may_one` and two genes
+    only to people in `may_two`, where everyone in `needs_gene` gets one.
+
+    Only every `parts`th choice of `one_gene`, starting from `part`,
+    is included, so the parts together cover every assignment once.
+    """
+    one = may_one
+    for choice in itertools.count():
+
+        # Step through subsets of the people left by clearing bits
+        if choice % parts == part:
+            rest = may_two & ~one
+            two = rest
+            while True:
+                if not needs_gene & ~(one | two):
+                    yield one, two
+                if not two:
+                    break
+                two = (two - 1) & rest
+
+        if not one:
+            break
+        one = (one - 1) & may_one
+
+
+def bits(masks, i):
+    """
+    Return an iterator over bit `i` of each bitmask.
+    """
+    return map(operator.and_, map(operator.rshift, masks, itertools.repeat(i)), itertools.repeat(1))
+
+
+def add_traits(people, probabilities):
+    """
+    Set each person's trait probabilities from their gene probabilities,
+    since a trait depends only on its own person's genes.
+    """
+    for person in people:
+        trait = people[person]["trait"]
+        for value in (True, False):
+            probabilities[person]["trait"][value] = sum(
+                probabilities[person]["gene"][genes] * (
+                    PROBS["trait"][genes][value] if trait is None else trait == value
+                )
+                for genes in GENES
+            )
+
+
+def eliminate_probabilities(people):
+    """
+    Return gene and trait probabilities for each person by exact
+    variable elimination over the family tree.
+
+    Eliminating genes one person at a time builds a tree of cliques,
+    passing messages up it. Passing messages back down then gives every
+    person's gene distribution from the same tree, so for tree-like
+    families the work grows roughly linearly with family size.
+    """
+    factors = [gene_factor(people, person) for person in people]
+
+    # Upward pass: eliminate each person's genes in turn, recording the
+    # clique of genes involved and the cliques whose messages it used
+    cliques = []
+    pool = dict()
+    holding = {person: set() for person in people}
+    keys = itertools.count()
+
+    # Index each factor by every person it involves
+    def add(factor, source):
+        key = next(keys)
+        pool[key] = (factor, source)
+        for name in factor[0]:
+            holding[name].add(key)
+
+    for factor in factors:
+        add(factor, None)
+    for person in elimination_order(people):
+        involved = []
+        for key in sorted(holding[person]):
+            factor, source = pool.pop(key)
+            for name in factor[0]:
+                holding[name].discard(key)
+            involved.append((factor, source))
+        product = multiply([factor for factor, _ in involved])
+        message = marginalize(product, set(product[0]) - {person})
+        cliques.append({
+            "person": person,
+            "factors": [factor for factor, source in involved if source is None],
+            "children": [source for _, source in involved if source is not None],
+            "message": message
+        })
+        add(message, len(cliques) - 1)
+
+    # Downward pass: parents are eliminated after their children, so
+    # walking cliques backwards reaches each one after its parent
+    probabilities = empty_probabilities(people)
+    downward = dict()
+    for k in reversed(range(len(cliques))):
+        clique = cliques[k]
+        incoming = clique["factors"] + [cliques[c]["message"] for c in clique["children"]]
+        if k in downward:
+            incoming.append(downward[k])
+
+        # Distribution over this clique's person, given all the evidence
+        gene = marginalize(multiply(incoming), {clique["person"]})[1]
+        for (genes,), p in gene.items():
+            probabilities[clique["person"]]["gene"][genes] = p
+
+        # Send each child everything except what it sent
+        for c in clique["children"]:
+            others = [factor for factor in incoming if factor is not cliques[c]["message"]]
+            downward[c] = marginalize(multiply(others), set(cliques[c]["message"][0]))
+
+    add_traits(people, probabilities)
 
-    # Ensure probabilities sum to 1
     normalize(probabilities)
+    return probabilities
 
-    # Print results
+
+def inheritance_table():
+    """
+    Return a table of the probability of a child's number of genes,
+    indexed by their mother's genes, their father's genes, then their own.
+    """
+    # Probability a parent passes the gene on, allowing for mutation
+    mutation = PROBS["mutation"]
+    passes = {0: mutation, 1: 0.5, 2: 1 - mutation}
+
+    table = []
+    for mother in GENES:
+        table.append([])
+        for father in GENES:
+            from_mother = passes[mother]
+            from_father = passes[father]
+            table[mother].append((
+                (1 - from_mother) * (1 - from_father),
+                from_mother * (1 - from_father) + (1 - from_mother) * from_father,
+                from_mother * from_father
+            ))
+    return table
+
+
+def gene_factor(people, person):
+    """
+    Return the factor for a person's genes, as a tuple of names and a
+    table from their genes to probabilities: the probability of the
+    person's genes given their parents' genes, times the probability
+    of the person's trait, if it is known.
+    """
+    mother = people[person]["mother"]
+    father = people[person]["father"]
+    trait = people[person]["trait"]
+    names = (person,) if mother is None else (person, mother, father)
+    inheritance = inheritance_table()
+
+    table = dict()
+    for genes in itertools.product(GENES, repeat=len(names)):
+        if mother is None:
+            p = PROBS["gene"][genes[0]]
+        else:
+            p = inheritance[genes[1]][genes[2]][genes[0]]
+        if trait is not None:
+            p *= PROBS["trait"][genes[0]][trait]
+        table[genes] = p
+    return names, table
+
+
+def multiply(factors):
+    """
+    Return the product of a list of factors, over all their names.
+    """
+    names = tuple(dict.fromkeys(name for factor in factors for name in factor[0]))
+    table = dict()
+    for genes in itertools.product(GENES, repeat=len(names)):
+        assignment = dict(zip(names, genes))
+        p = 1
+        for factor_names, factor_table in factors:
+            p *= factor_table[tuple(assignment[name] for name in factor_names)]
+        table[genes] = p
+    return names, table
+
+
+def marginalize(factor, keep):
+    """
+    Return a factor summed over every name not in `keep`, scaled
+    to sum to 1 so long chains of messages do not underflow.
+    """
+    names, table = factor
+    kept = tuple(name for name in names if name in keep)
+    positions = [names.index(name) for name in kept]
+    result = dict()
+    for genes, p in table.items():
+        key = tuple(genes[i] for i in positions)
+        result[key] = result.get(key, 0) + p
+    total = sum(result.values())
+    if total:
+        result = {key: p / total for key, p in result.items()}
+    return kept, result
+
+
+def elimination_order(people):
+    """
+    Return the order to eliminate people's genes in, always picking
+    the person linked to the fewest others, where a person is linked
+    to their parents, their children, and their children's other parents.
+    """
+    links = {person: set() for person in people}
+    for person in people:
+        family = [person, people[person]["mother"], people[person]["father"]]
+        family = [member for member in family if member is not None]
+        for member in family:
+            links[member].update(family)
+    for person in people:
+        links[person].discard(person)
+
+    # Pick from a heap, skipping entries whose link count has changed
+    heap = [(len(links[person]), person) for person in people]
+    heapq.heapify(heap)
+    order = []
+    while heap:
+        count, person = heapq.heappop(heap)
+        if person not in links or count != len(links[person]):
+            continue
+        order.append(person)
+
+        # Eliminating a person links all of their links together
+        neighbors = links.pop(person)
+        for neighbor in neighbors:
+            links[neighbor].discard(person)
+            links[neighbor].update(neighbors - {neighbor})
+            heapq.heappush(heap, (len(links[neighbor]), neighbor))
+    return order
+
+
+def sample_probabilities(people, sampler, samples=SAMPLES, chains=1):
+    """
+    Return (probabilities, errors, effective): estimates of gene and
+    trait probabilities for each person from `chains` independent runs
+    of a sampler, each drawing `samples` samples, the standard error of
+    each estimate, and the effective sample size behind the estimates.
+    Chains run in separate processes.
+    """
+    if chains == 1:
+        batches = sampler(people, samples, 0)
+    else:
+        with ProcessPoolExecutor(chains) as executor:
+            runs = executor.map(
+                sampler, itertools.repeat(people, chains), itertools.repeat(samples, chains), range(chains)
+            )
+            batches = [batch for run in runs for batch in run]
+
+    # Average the batches by weight, and estimate the standard error of
+    # the weighted average from how much the weighted batches differ
+    batches = [batch for batch in batches if batch[1]]
+    total = sum(weight for _, weight, _ in batches)
+    probabilities = empty_probabilities(people)
+    errors = empty_probabilities(people)
     for person in people:
-        print(f"{person}:")
         for field in probabilities[person]:
-            print(f"  {field.capitalize()}:")
             for value in probabilities[person][field]:
-                p = probabilities[person][field][value]
-                print(f"    {value}: {p:.4f}")
+                estimates = [estimate[person][field][value] for estimate, _, _ in batches]
+                mean = sum(
+                    p * weight for p, (_, weight, _) in zip(estimates, batches)
+                ) / total
+                probabilities[person][field][value] = mean
+                errors[person][field][value] = math.sqrt(
+                    sum(
+                        (weight / total) ** 2 * (p - mean) ** 2
+                        for p, (_, weight, _) in zip(estimates, batches)
+                    ) * len(batches) / (len(batches) - 1)
+                ) if len(batches) > 1 else float("nan")
+
+    # Samplers that weight samples report the sum of squared weights,
+    # giving Kish's effective sample size. When a few samples carry most
+    # of the weight, batches can agree while all being wrong, so errors
+    # are kept at least as large as that many independent samples give,
+    # adjusted as Agresti and Coull do so estimates of 0 or 1 keep an error
+    squares = [square for _, _, square in batches]
+    if None not in squares:
+        effective = total ** 2 / sum(squares) if batches else 0
+        for person in people:
+            for field in errors[person]:
+                for value in errors[person][field]:
+                    p = probabilities[person][field][value]
+                    adjusted = (p * effective + 2) / (effective + 4)
+                    errors[person][field][value] = max(
+                        errors[person][field][value],
+                        math.sqrt(adjusted * (1 - adjusted) / (effective + 4))
+                    )
+
+    # Otherwise, estimate it from how much less the batches agree than
+    # independent samples would, for the least certain estimate
+    else:
+        effective = min((
+            p * (1 - p) / errors[person][field][value] ** 2
+            for person in people
+            for field in errors[person]
+            for value, p in probabilities[person][field].items()
+            if errors[person][field][value] > 0
+        ), default=float("nan"))
+
+    return probabilities, errors, effective
+
+
+def batch_estimate(people, genes, weights):
+    """
+    Return (probabilities, weight, squares) estimated from a batch of
+    weighted samples, where `genes` maps each person to their number of
+    genes in each sample, weight is the total weight of the batch and
+    squares the sum of the squared weights.
+    """
+    probabilities = empty_probabilities(people)
+    total = sum(weights)
+    if not total:
+        return probabilities, 0, 0
+    for person in people:
+        for value in GENES:
+            matches = map(operator.eq, genes[person], itertools.repeat(value))
+            probabilities[person]["gene"][value] = sum(itertools.compress(weights, matches))
+    add_traits(people, probabilities)
+    normalize(probabilities)
+    return probabilities, total, sum(map(operator.mul, weights, weights))
+
+
+def family_order(people):
+    """
+    Return a list of people with everyone after their parents.
+    """
+    children = {person: [] for person in people}
+    waiting = dict()
+    for person in people:
+        parents = {people[person]["mother"], people[person]["father"]} - {None}
+        waiting[person] = len(parents)
+        for parent in parents:
+            children[parent].append(person)
+
+    order = [person for person in people if not waiting[person]]
+    for person in order:
+        for child in children[person]:
+            waiting[child] -= 1
+            if not waiting[child]:
+                order.append(child)
+    return order
+
+
+def weighting_batches(people, samples, seed):
+    """
+    Return a list of (probabilities, weight, squares) batch estimates
+    from `samples` samples drawn by likelihood weighting: genes are sampled
+    parents first, and each sample is weighted by the probability
+    of everyone's known traits.
+    """
+    rng = random.Random(seed)
+    inheritance = inheritance_table()
+    order = family_order(people)
+
+    # Cumulative probabilities of 0 and 1 genes for founders, and for
+    # children by their parents' genes, so a uniform number picks genes
+    founder = list(itertools.accumulate(PROBS["gene"][g] for g in GENES))
+    child = [list(itertools.accumulate(inheritance[m][f])) for m in GENES for f in GENES]
+    lows = [cumulative[0] for cumulative in child]
+    highs = [cumulative[1] for cumulative in child]
+
+    batches = []
+    size = max(1, samples // BATCHES)
+    for start in range(0, samples, size):
+        count = min(size, samples - start)
+
+        # Sample everyone's genes a column at a time across the batch
+        genes = dict()
+        weights = [1.0] * count
+        for person in order:
+            mother = people[person]["mother"]
+            father = people[person]["father"]
+            u = [rng.random() for _ in range(count)]
+            if mother is None:
+                low = itertools.repeat(founder[0])
+                high = itertools.repeat(founder[1])
+            else:
+                codes = list(encode([genes[mother], genes[father]], [3, 3]))
+                low = map(lows.__getitem__, codes)
+                high = map(highs.__getitem__, codes)
+            genes[person] = list(map(operator.add, map(operator.gt, u, low), map(operator.gt, u, high)))
+
+            # Weight by the probability of the person's known trait
+            trait = people[person]["trait"]
+            if trait is not None:
+                likelihood = [PROBS["trait"][g][trait] for g in GENES]
+                weights = list(map(operator.mul, weights, map(likelihood.__getitem__, genes[person])))
+
+        batches.append(batch_estimate(people, genes, weights))
+    return batches
+
+
+def gibbs_batches(people, samples, seed):
+    """
+    Return a list of (probabilities, weight, None) batch estimates from
+    a Gibbs sampler run for `samples` sweeps after BURN_IN sweeps, each
+    sweep resampling every person's genes given everyone else's. The
+    weight of a batch is its number of sweeps.
+    """
+    rng = random.Random(seed)
+    inheritance = inheritance_table()
+    order = family_order(people)
+    children = {person: [] for person in people}
+    for person in people:
+        for parent in (people[person]["mother"], people[person]["father"]):
+            if parent is not None:
+                children[parent].append(person)
+
+    # Start from genes sampled parents first, ignoring traits
+    genes = dict()
+    for person in order:
+        mother = people[person]["mother"]
+        father = people[person]["father"]
+        if mother is None:
+            weights = [PROBS["gene"][g] for g in GENES]
+        else:
+            weights = inheritance[genes[mother]][genes[father]]
+        genes[person] = rng.choices(GENES, weights)[0]
+
+    batches = []
+    size = max(1, samples // BATCHES)
+    sums = {person: [0, 0, 0] for person in people}
+    sweeps = 0
+    for sweep in range(BURN_IN + samples):
+        for person in order:
+
+            # Probability of each number of genes given the rest of the
+            # family: from the person's parents, trait and children
+            mother = people[person]["mother"]
+            father = people[person]["father"]
+            trait = people[person]["trait"]
+            weights = []
+            for g in GENES:
+                if mother is None:
+                    p = PROBS["gene"][g]
+                else:
+                    p = inheritance[genes[mother]][genes[father]][g]
+                if trait is not None:
+                    p *= PROBS["trait"][g][trait]
+                for child in children[person]:
+                    m = g if people[child]["mother"] == person else genes[people[child]["mother"]]
+                    f = g if people[child]["father"] == person else genes[people[child]["father"]]
+                    p *= inheritance[m][f][genes[child]]
+                weights.append(p)
+            genes[person] = rng.choices(GENES, weights)[0]
+
+            # Count the whole distribution rather than just the sample
+            if sweep >= BURN_IN:
+                total = sum(weights)
+                for g in GENES:
+                    sums[person][g] += weights[g] / total
+
+        if sweep >= BURN_IN:
+            sweeps += 1
+            if sweeps == size or sweep == BURN_IN + samples - 1:
+                estimate = empty_probabilities(people)
+                for person in people:
+                    for g in GENES:
+                        estimate[person]["gene"][g] = sums[person][g]
+                add_traits(people, estimate)
+                normalize(estimate)
+                batches.append((estimate, sweeps, None))
+                sums = {person: [0, 0, 0] for person in people}
+                sweeps = 0
+    return batches
 
 
 def load_data(filename):
@@ -118,14 +701,15 @@ def load_data(filename):
 
 def powerset(s):
     """
-    Return a list of all possible subsets of set s.
+    Return an iterator over all possible subsets of set s,
+    making each subset only when it is reached.
     """
     s = list(s)
-    return [
-        set(s) for s in itertools.chain.from_iterable(
+    return (
+        set(subset) for subset in itertools.chain.from_iterable(
             itertools.combinations(s, r) for r in range(len(s) + 1)
         )
-    ]
+    )
 
 
 def joint_probability(people, one_gene, two_genes, have_trait):
@@ -138,145 +722,77 @@ def joint_probability(people, one_gene, two_genes, have_trait):
         * everyone not in `one_gene` or `two_gene` does not have the gene, and
         * everyone in set `have_trait` has the trait, and
         * everyone not in set` have_trait` does not have the trait.
-    """    
-    # Define probabilities for each person
-    probabilities = dict()
+    """
+    inheritance = inheritance_table()
+    genes = {
+        person: 1 if person in one_gene else 2 if person in two_genes else 0
+        for person in people
+    }
 
-    # Compute probabilities for all people
+    # Multiply all person probabilities
+    probability = 1
     for person in people:
+        mother = people[person]["mother"]
+        father = people[person]["father"]
+        if mother is None:
+            probability *= PROBS["gene"][genes[person]]
+        else:
+            probability *= inheritance[genes[mother]][genes[father]][genes[person]]
+        probability *= PROBS["trait"][genes[person]][person in have_trait]
 
-        # 1. People with one gene
-        if person in one_gene:
-            
-            #Check for parents
-            if people[person]['mother'] == None and people[person]['father'] == None:
-                probabilities[person] = PROBS['gene'][1]
-            else:
-                probabilities[person] = 0
-                
-                #Check mother one gene
-                if people[person]['mother'] in one_gene:
-                    if people[person]['father'] in one_gene:
-                        probabilities[person] = 0.5 * 0.5 + 0.5 * 0.5
-                    elif people[person]['father'] in two_genes:
-                        probabilities[person] = 0.99 * 0.5 + 0.01 * 0.5
-                    else:
-                        probabilities[person] = 0.01 * 0.5 + 0.99 * 0.5
-                
-                #Check mother two genes
-                elif people[person]['mother'] in two_genes:
-                    if people[person]['father'] in one_gene:
-                        probabilities[person] = 0.5 * 0.01 + 0.5 * 0.99
-                    elif people[person]['father'] in two_genes:
-                        probabilities[person] = 0.99 * 0.01 + 0.01 * 0.99
-                    else:
-                        probabilities[person] = 0.01 * 0.01 + 0.99 * 0.99
-                
-                else:
-                    if people[person]['father'] in one_gene:
-                        probabilities[person] = 0.5 * 0.01 + 0.5 * 0.99
-                    elif people[person]['father'] in two_genes:
-                        probabilities[person] = 0.99 * 0.99 + 0.01 * 0.01
-                    else:
-                        probabilities[person] = 0.99 * 0.01 + 0.01 * 0.99
-
-            #Trait condition
-            if person in have_trait:
-                probabilities[person] *= PROBS['trait'][1][True]
-            else:
-                probabilities[person] *= PROBS['trait'][1][False]
+    return probability
 
-        
-        # 2. People with two genes
-        elif person in two_genes:
-            
-            #Check for parents
-            if people[person]['mother'] == None and people[person]['father'] == None:
-                probabilities[person] = PROBS['gene'][2]
-            else:
-                probabilities[person] = 0
-                
-                #Check mother one gene
-                if people[person]['mother'] in one_gene:
-                    if people[person]['father'] in one_gene:
-                        probabilities[person] = 0.5 * 0.5
-                    elif people[person]['father'] in two_genes:
-                        probabilities[person] = 0.5 * 0.99
-                    else:
-                        probabilities[person] = 0.5 * 0.01
-                
-                #Check mother two genes
-                elif people[person]['mother'] in two_genes:
-                    if people[person]['father'] in one_gene:
-                        probabilities[person] = 0.99 * 0.5
-                    elif people[person]['father'] in two_genes:
-                        probabilities[person] = 0.99 * 0.99
-                    else:
-                        probabilities[person] = 0.99 * 0.01
-                
-                else:
-                    if people[person]['father'] in one_gene:
-                        probabilities[person] = 0.01 * 0.5
-                    elif people[person]['father'] in two_genes:
-                        probabilities[person] = 0.01 * 0.99
-                    else:
-                        probabilities[person] = 0.01 * 0.01
-
-            #Trait condition
-            if person in have_trait:
-                probabilities[person] *= PROBS['trait'][2][True]
-            else:
-                probabilities[person] *= PROBS['trait'][2][False]
 
-        
-        # 3. People with no genes        
+def joint_probabilities(people, genes, traits):
+    """
+    Return a list of joint probabilities for many assignments at once.
+
+    `genes` maps each person to a sequence of their number of genes in
+    every assignment, and `traits` to a sequence of 1 where they have
+    the trait and 0 where they do not, all the same length. A person's
+    trait may instead be None, summing over whether they have it.
+    """
+    inheritance = inheritance_table()
+
+    # Work a column at a time, so each loop over assignments runs in C
+    product = None
+    for person in people:
+        mother = people[person]["mother"]
+        father = people[person]["father"]
+
+        # Look up each assignment's probability in a flat table for this
+        # person, indexed by parents' genes, own genes, then any trait
+        if mother is None:
+            columns = [genes[person]]
+            table = [PROBS["gene"][g] for g in GENES]
         else:
-    
-            #Check for parents
-            if people[person]['mother'] == None and people[person]['father'] == None:
-                probabilities[person] = PROBS['gene'][0]
-            else:
-                probabilities[person] = 0
-                
-                #Check mother one gene
-                if people[person]['mother'] in one_gene:
-                    if people[person]['father'] in one_gene:
-                        probabilities[person] = 0.5 * 0.5
-                    elif people[person]['father'] in two_genes:
-                        probabilities[person] = 0.5 * 0.01
-                    else:
-                        probabilities[person] = 0.5 * 0.99
-                
-                #Check mother two genes
-                elif people[person]['mother'] in two_genes:
-                    if people[person]['father'] in one_gene:
-                        probabilities[person] = 0.01 * 0.5
-                    elif people[person]['father'] in two_genes:
-                        probabilities[person] = 0.01 * 0.01
-                    else:
-                        probabilities[person] = 0.01 * 0.99
-                
-                else:
-                    if people[person]['father'] in one_gene:
-                        probabilities[person] = 0.99 * 0.5
-                    elif people[person]['father'] in two_genes:
-                        probabilities[person] = 0.99 * 0.01
-                    else:
-                        probabilities[person] = 0.99 * 0.99
-            
-            # Trait condition
-            if person in have_trait:
-                probabilities[person] *= PROBS['trait'][0][True]
-            else:
-                probabilities[person] *= PROBS['trait'][0][False]
-        
-    
-    # Multiply all person probabilities
-    probability = 1
-    for person in probabilities:
-        probability *= probabilities[person]
-    
-    return probability
+            columns = [genes[mother], genes[father], genes[person]]
+            table = [inheritance[m][f][g] for m in GENES for f in GENES for g in GENES]
+        sizes = [3] * len(columns)
+        if traits[person] is not None:
+            columns.append(traits[person])
+            sizes.append(2)
+            table = [
+                p * PROBS["trait"][i % 3][t]
+                for i, p in enumerate(table) for t in (False, True)
+            ]
+
+        codes = encode(columns, sizes)
+        column = map(table.__getitem__, codes)
+        product = list(column if product is None else map(operator.mul, product, column))
+
+    return product
+
+
+def encode(columns, sizes):
+    """
+    Return an iterator combining columns of digits, where the digits of
+    each column are less than its size, into one number per row.
+    """
+    codes = columns[0]
+    for column, size in zip(columns[1:], sizes[1:]):
+        codes = map(operator.add, map(operator.mul, codes, itertools.repeat(size)), column)
+    return codes
 
 
 def update(probabilities, one_gene, two_genes, have_trait, p):
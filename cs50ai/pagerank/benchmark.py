@@ -0,0 +1,111 @@
+import json
+import random
+import sys
+import time
+import tracemalloc
+from array import array
+
+from pagerank import DAMPING, METHODS, crawl, link_graph, power_iteration, transition_matrix
+
+CORPORA = ["corpus0", "corpus1", "corpus2"]
+
+# Synthetic graph shape: out-degrees follow a Pareto distribution
+# capped at MAX_LINKS, and link targets have Zipf-like popularity
+LINK_SHAPE = 1.5
+MAX_LINKS = 200
+POPULARITY = 0.9
+DANGLING = 0.1
+
+# Tolerance of the reference ranks every method is compared against
+REFERENCE_TOLERANCE = 1e-13
+
+
+def main():
+    if len(sys.argv) > 3:
+        sys.exit("Usage: python benchmark.py [pages,...] [results.json]")
+    sizes = [int(size) for size in sys.argv[1].split(",")] if len(sys.argv) >= 2 else [1000, 10000]
+    output = sys.argv[2] if len(sys.argv) == 3 else None
+
+    graphs = []
+    for corpus in CORPORA:
+        _, offsets, links = link_graph(crawl(corpus))
+        graphs.append((corpus, offsets, links))
+    for size in sizes:
+        offsets, links = synthetic_graph(size)
+        graphs.append((f"synthetic-{size}", offsets, links))
+
+    results = [benchmark(name, offsets, links) for name, offsets, links in graphs]
+
+    report = json.dumps(results, indent=2)
+    if output is None:
+        print(report)
+    else:
+        with open(output, "w") as f:
+            f.write(report + "\n")
+
+
+def synthetic_graph(pages, seed=0):
+    """
+    Return (offsets, links) for a random link graph of `pages` pages
+    with heavy-tailed out-degrees, popular targets and some pages
+    without links.
+    """
+    rng = random.Random(seed)
+    cumulative = []
+    total = 0
+    for rank in range(1, pages + 1):
+        total += rank ** -POPULARITY
+        cumulative.append(total)
+
+    # Shuffle which pages are popular so popularity does not follow page order
+    order = list(range(pages))
+    rng.shuffle(order)
+
+    offsets = array("q", [0])
+    links = array("i")
+    for i in range(pages):
+        if rng.random() >= DANGLING:
+            count = min(MAX_LINKS, int(rng.paretovariate(LINK_SHAPE)))
+            targets = {order[j] for j in rng.choices(range(pages), cum_weights=cumulative, k=count)}
+            links.extend(sorted(targets - {i}))
+        offsets.append(len(links))
+    return offsets, links
+
+
+def benchmark(name, offsets, links):
+    """
+    Return how each method fares ranking one link graph: iterations,
+    wall time, peak memory, the residual after every iteration and
+    the final L1 error against tightly converged reference ranks.
+    """
+    matrix = transition_matrix(offsets, links)
+    reference, _, _ = power_iteration(matrix, DAMPING, REFERENCE_TOLERANCE)
+    result = {"graph": name, "pages": len(offsets) - 1, "links": len(links), "methods": {}}
+
+    for method in METHODS:
+        trace = []
+        start = time.perf_counter()
+        rank, iterations, residual = power_iteration(
+            matrix, DAMPING, method=method, callback=trace.append
+        )
+        seconds = time.perf_counter() - start
+
+        # Trace memory on a separate run, since tracing slows it down
+        tracemalloc.start()
+        power_iteration(matrix, DAMPING, method=method)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        result["methods"][method] = {
+            "iterations": iterations,
+            "seconds": seconds,
+            "peak_memory_bytes": peak,
+            "residual": residual,
+            "error": sum(abs(value - exact) for value, exact in zip(rank, reference)),
+            "residuals": [entry["residual"] for entry in trace]
+        }
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+import mmap
+import os
+import re
+import struct
+import sys
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+# Same link pattern as pagerank.crawl
+LINK = re.compile(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"")
+
+# Characters read from a page at a time, and the most kept back
+# in case a link is split across two reads
+CHUNK = 1 << 16
+OVERLAP = 4096
+
+# Link graph file written into a corpus directory by crawl_graph
+GRAPH = "pagerank.graph"
+GRAPH_MAGIC = b"PRGRAPH1"
+HEADER = struct.Struct("=8s3q")
+
+
+def main():
+    if len(sys.argv) not in [2, 3, 4]:
+        sys.exit("Usage: python graph.py corpus [output] [workers]")
+    workers = int(sys.argv[3]) if len(sys.argv) == 4 else None
+
+    # Without an output, update the link graph file kept in the corpus
+    if len(sys.argv) == 2:
+        pages, _, links = crawl_graph(sys.argv[1])
+        print(f"Stored {len(links)} links between {len(pages)} pages.")
+    else:
+        pages, edges = crawl_edges(sys.argv[1], sys.argv[2], workers)
+        print(f"Wrote {edges} links between {len(pages)} pages.")
+
+
+def page_links(path):
+    """
+    Return the set of link targets in an HTML file,
+    reading it a chunk at a time instead of all at once.
+    """
+    links = set()
+    tail = ""
+    with open(path) as f:
+        while True:
+            chunk = f.read(CHUNK)
+            if not chunk:
+                return links
+            text = tail + chunk
+            end = 0
+            for match in LINK.finditer(text):
+                links.add(match.group(1))
+                end = match.end()
+
+            # Keep any unmatched text that could start a link
+            tail = text[max(end, len(text) - OVERLAP):]
+
+
+def crawl_edges(directory, output, workers=None):
+    """
+    Parse a directory of HTML pages across `workers` processes and write
+    its link graph as an edge list: page names, one per line, to
+    `output`.pages, and (source, target) page index pairs as native
+    32-bit integers to `output`.edges, sorted by source.
+
+    Return the list of page names and the number of links written.
+    """
+    pages = sorted(filename for filename in os.listdir(directory) if filename.endswith(".html"))
+    index = {page: i for i, page in enumerate(pages)}
+
+    with open(f"{output}.pages", "w", encoding="utf-8") as f:
+        for page in pages:
+            f.write(page + "\n")
+
+    # Write each page's links as soon as its worker is done with it
+    edges = 0
+    paths = [os.path.join(directory, page) for page in pages]
+    chunksize = max(1, len(paths) // (4 * (workers or os.cpu_count() or 1)))
+    with ProcessPoolExecutor(workers) as executor, open(f"{output}.edges", "wb") as f:
+        for i, links in enumerate(executor.map(page_links, paths, chunksize=chunksize)):
+            targets = sorted(index[link] for link in links if link in index and index[link] != i)
+            pairs = array("i")
+            for j in targets:
+                pairs.extend((i, j))
+            f.write(pairs.tobytes())
+            edges += len(targets)
+
+    return pages, edges
+
+
+def page_stats(directory, pages):
+    """
+    Return arrays of the modification time and size of each page.
+    """
+    mtimes = array("q")
+    sizes = array("q")
+    for page in pages:
+        stat = os.stat(os.path.join(directory, page))
+        mtimes.append(stat.st_mtime_ns)
+        sizes.append(stat.st_size)
+    return mtimes, sizes
+
+
+def save_graph(path, pages, offsets, links, mtimes, sizes):
+    """
+    Write a link graph to `path`: a header, then the modification time
+    and size of every page, the link offsets, the links, and finally
+    the page names, so every array starts on an 8 byte boundary.
+    """
+    names = "\0".join(pages).encode("utf-8")
+    with open(f"{path}.tmp", "wb") as f:
+        f.write(HEADER.pack(GRAPH_MAGIC, len(pages), len(links), len(names)))
+        for values in (mtimes, sizes, offsets):
+            f.write(array("q", values).tobytes())
+        f.write(array("i", links).tobytes())
+        f.write(b"\0" * (-4 * len(links) % 8))
+        f.write(names)
+    os.replace(f"{path}.tmp", path)
+
+
+def load_graph(path):
+    """
+    Memory-map a link graph written by save_graph. Return
+    (pages, offsets, links, mtimes, sizes), where the number arrays
+    are views straight onto the file, or None if it is not a graph
+    or has been cut short.
+    """
+    with open(path, "rb") as f:
+
+        # An empty file cannot even be mapped
+        if os.fstat(f.fileno()).st_size < HEADER.size:
+            return None
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, n, m, names_size = HEADER.unpack_from(data)
+    if magic != GRAPH_MAGIC or min(n, m, names_size) < 0:
+        return None
+
+    # Check every array and the names fit in the file
+    size = HEADER.size + 8 * (3 * n + 1) + 4 * m + (-4 * m % 8) + names_size
+    if len(data) < size:
+        return None
+
+    view = memoryview(data)
+    start = HEADER.size
+    arrays = []
+    for typecode, count in (("q", n), ("q", n), ("q", n + 1), ("i", m)):
+        size = count * struct.calcsize(typecode)
+        arrays.append(view[start:start + size].cast(typecode))
+        start += size + (-size % 8)
+    mtimes, sizes, offsets, links = arrays
+    pages = bytes(view[start:start + names_size]).decode("utf-8").split("\0") if n else []
+    return pages, offsets, links, mtimes, sizes
+
+
+def crawl_graph(directory, workers=None):
+    """
+    Return the link graph of a directory of HTML pages as
+    (pages, offsets, links), the same form as pagerank.link_graph.
+
+    The graph is kept in a file in the directory. When it exists and
+    the same pages are present, it is loaded without parsing any HTML
+    and only pages modified since are parsed again.
+    """
+    path = os.path.join(directory, GRAPH)
+    pages = sorted(filename for filename in os.listdir(directory) if filename.endswith(".html"))
+    mtimes, sizes = page_stats(directory, pages)
+
+    previous = load_graph(path) if os.path.exists(path) else None
+    if previous is not None and previous[0] == pages:
+        _, old_offsets, old_links, old_mtimes, old_sizes = previous
+        changed = [
+            i for i in range(len(pages))
+            if mtimes[i] != old_mtimes[i] or sizes[i] != old_sizes[i]
+        ]
+        if not changed:
+            return previous[:3]
+    else:
+        old_offsets = old_links = None
+        changed = range(len(pages))
+
+    # Parse only the changed pages
+    index = {page: i for i, page in enumerate(pages)}
+    paths = [os.path.join(directory, pages[i]) for i in changed]
+    if len(paths) > 1:
+        with ProcessPoolExecutor(workers) as executor:
+            parsed = executor.map(page_links, paths, chunksize=max(1, len(paths) // 64))
+            parsed = dict(zip(changed, parsed))
+    else:
+        parsed = dict(zip(changed, map(page_links, paths)))
+
+    # Reuse the stored links of every unchanged page
+    offsets = array("q", [0])
+    links = array("i")
+    for i in range(len(pages)):
+        if i in parsed:
+            links.extend(sorted(
+                index[link] for link in parsed[i] if link in index and index[link] != i
+            ))
+        else:
+            links.extend(old_links[old_offsets[i]:old_offsets[i + 1]])
+        offsets.append(len(links))
+
+    save_graph(path, pages, offsets, links, mtimes, sizes)
+    return pages, offsets, links
+
+
+def read_edges(output):
+    """
+    Return the page names and (sources, targets) index arrays
+    of an edge list written by crawl_edges.
+    """
+    with open(f"{output}.pages", encoding="utf-8") as f:
+        pages = f.read().splitlines()
+    pairs = array("i")
+    with open(f"{output}.edges", "rb") as f:
+        pairs.frombytes(f.read())
+    return pages, pairs[0::2], pairs[1::2]
+
+
+def edge_graph(output):
+    """
+    Return the edge list written by crawl_edges as (pages, offsets, links),
+    the same form as pagerank.link_graph, ready for the rank engines.
+    """
+    pages, sources, targets = read_edges(output)
+
+    # Edges are sorted by source, so counting them gives the offsets
+    offsets = array("q", [0]) * (len(pages) + 1)
+    for i in sources:
+        offsets[i + 1] += 1
+    for i in range(len(pages)):
+        offsets[i + 1] += offsets[i]
+    return pages, offsets, targets
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,47 @@
+import heapq
+import mmap
+import multiprocessing
+import operator
 import os
 import random
 import re
+import shutil
 import sys
-import copy
+import tempfile
+import time
+import tracemalloc
+from array import array
+from collections import deque
+
+from graph import crawl_graph
 
 DAMPING = 0.85
 SAMPLES = 10000
 
+# Largest L1 change between iterations at which PageRank counts as converged
+TOLERANCE = 0.000001
+
+# Solvers power_iteration can use, and how many plain iterations
+# the extrapolating one runs between extrapolations
+METHODS = ["jacobi", "gauss-seidel", "quadratic"]
+EXTRAPOLATION_PERIOD = 10
+
+# Links read from disk at a time by block_pagerank
+EDGE_CHUNK = 1 << 20
+
 
 def main():
     if len(sys.argv) != 2:
         sys.exit("Usage: python pagerank.py corpus")
-    corpus = crawl(sys.argv[1])
-    ranks = sample_pagerank(corpus, DAMPING, SAMPLES)
+
+    # Reuse the link graph stored in the corpus, parsing only changed pages
+    pages, offsets, links = crawl_graph(sys.argv[1])
+    ranks = dict(zip(pages, sample_ranks(offsets, links, DAMPING, SAMPLES)))
     print(f"PageRank Results from Sampling (n = {SAMPLES})")
     for page in sorted(ranks):
         print(f"  {page}: {ranks[page]:.4f}")
-    ranks = iterate_pagerank(corpus, DAMPING)
+    rank, _, _ = power_iteration(transition_matrix(offsets, links), DAMPING)
+    ranks = dict(zip(pages, rank))
     print(f"PageRank Results from Iteration")
     for page in sorted(ranks):
         print(f"  {page}: {ranks[page]:.4f}")
@@ -67,7 +92,7 @@ def transition_model(corpus, page, damping_factor):
     return transitions
 
 
-def sample_pagerank(corpus, damping_factor, n):
+def sample_pagerank(corpus, damping_factor, n, walkers=1):
     """
     Return PageRank values for each page by sampling `n` pages
     according to transition model, starting with a page at random.
@@ -75,23 +100,57 @@ def sample_pagerank(corpus, damping_factor, n):
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
+
+    With several `walkers`, the samples are split between independent
+    random walks run in parallel processes.
     """
-    # Initiate page rank dictionary
-    page_rank = dict()
-    for key in corpus:
-        page_rank[key] = 0
-    
-    # Select start page and transition n times from there
-    page = random.choice(tuple(corpus.keys()))
-    for sample in range(n):
-        page_rank[page] += 1
-        transitions = transition_model(corpus, page, damping_factor)
-        page = random.choices(tuple(transitions.keys()), weights = transitions.values())[0]
-    
+    pages, offsets, links = link_graph(corpus)
+    return dict(zip(pages, sample_ranks(offsets, links, damping_factor, n, walkers)))
+
+
+def sample_ranks(offsets, links, damping_factor, n, walkers=1):
+    """
+    Return the fraction of `n` random walk steps spent on each page
+    of a link graph, as a list in page index order.
+    """
+    # Split the samples as evenly as possible between walkers
+    steps = [n // walkers + (1 if w < n % walkers else 0) for w in range(walkers)]
+    if walkers > 1:
+
+        # Copy memory-mapped graphs into arrays that can be sent to workers
+        offsets, links = array("q", offsets), array("i", links)
+        jobs = [(offsets, links, damping_factor, count, random.getrandbits(64)) for count in steps]
+        with multiprocessing.Pool(walkers) as pool:
+            walks = pool.starmap(random_walk, jobs)
+    else:
+        walks = [random_walk(offsets, links, damping_factor, n, random.getrandbits(64))]
+
     # Compute probability distribution for all page visits
-    for key in page_rank:
-        page_rank[key] = page_rank[key] / n
-    return(page_rank)
+    return [sum(counts[i] for counts in walks) / n for i in range(len(offsets) - 1)]
+
+
+def random_walk(offsets, links, damping_factor, n, seed):
+    """
+    Return how many times a random surfer visits each page in `n` steps.
+
+    Each step follows a random link with probability `damping_factor`
+    and jumps to a random page otherwise, or always if the page has no
+    links. The link offsets give every page's choices directly, so each
+    step takes constant time.
+    """
+    pages = len(offsets) - 1
+    counts = array("q", [0]) * pages
+    uniform = random.Random(seed).random
+    page = int(uniform() * pages)
+    for _ in range(n):
+        counts[page] += 1
+        start = offsets[page]
+        choices = offsets[page + 1] - start
+        if choices and uniform() < damping_factor:
+            page = links[start + int(uniform() * choices)]
+        else:
+            page = int(uniform() * pages)
+    return counts
 
 
 def iterate_pagerank(corpus, damping_factor):
@@ -103,35 +162,438 @@ def iterate_pagerank(corpus, damping_factor):
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
     """
-    # Initiage page rank dictionary
-    page_rank = dict()
-    for key in corpus:
-        page_rank[key] = 1 / len(corpus)
-    page_rank_temp = copy.deepcopy(page_rank)
-    
-    # Compute conditional probability distribution
+    pages, offsets, links = link_graph(corpus)
+    rank, _, _ = power_iteration(transition_matrix(offsets, links), damping_factor)
+    return dict(zip(pages, rank))
+
+
+def link_graph(corpus):
+    """
+    Return the corpus as (pages, offsets, links), where `pages` lists
+    page names in sorted order and the page with index i links to
+    the page indices links[offsets[i]:offsets[i + 1]].
+    """
+    pages = sorted(corpus)
+    index = {page: i for i, page in enumerate(pages)}
+    offsets = array("q", [0])
+    links = array("i")
+    for page in pages:
+        links.extend(sorted(index[link] for link in corpus[page]))
+        offsets.append(len(links))
+    return pages, offsets, links
+
+
+def transition_matrix(offsets, links):
+    """
+    Return the transition matrix of a link graph in compressed sparse
+    row form, as (in_offsets, in_links, out_degree): the pages linking
+    to page j are in_links[in_offsets[j]:in_offsets[j + 1]], and each
+    passes on a 1 / out_degree share of its rank along every link.
+    """
+    n = len(offsets) - 1
+    out_degree = array("i", (offsets[i + 1] - offsets[i] for i in range(n)))
+
+    # Count in-links per page, then place each link with a counting sort
+    in_offsets = array("q", [0]) * (n + 1)
+    for j in links:
+        in_offsets[j + 1] += 1
+    for j in range(n):
+        in_offsets[j + 1] += in_offsets[j]
+    in_links = array("i", [0]) * len(links)
+    position = in_offsets[:-1]
+    for i in range(n):
+        for j in links[offsets[i]:offsets[i + 1]]:
+            in_links[position[j]] = i
+            position[j] += 1
+
+    return in_offsets, in_links, out_degree
+
+
+def power_iteration(matrix, damping_factor, tolerance=TOLERANCE, rank=None,
+                    method="jacobi", callback=None):
+    """
+    Return (rank, iterations, residual) for the transition matrix from
+    transition_matrix, iterating from `rank` (uniform by default) until
+    the L1 change between iterations falls below `tolerance`.
+
+    Pages without links are treated as linking to every page.
+
+    `method` is one of METHODS: plain "jacobi" updates; "gauss-seidel",
+    which uses each page's new rank as soon as it is known; or
+    "quadratic", which periodically extrapolates from the last four
+    iterates. If given, `callback` is called after every iteration with
+    a dictionary of the iteration number, residual, seconds elapsed and,
+    while tracemalloc is tracing, the bytes of memory allocated.
+    """
+    if method not in METHODS:
+        raise ValueError(f"unknown method {method!r}, expected one of {METHODS}")
+    out_degree = matrix[2]
+    n = len(out_degree)
+    rank = array("d", [1 / n]) * n if rank is None else array("d", rank)
+    dangling = [i for i in range(n) if out_degree[i] == 0]
+    step = gauss_seidel_step if method == "gauss-seidel" else pagerank_step
+    history = deque(maxlen=4)
+
+    start = time.perf_counter()
+    iterations = 0
+    while True:
+        iterations += 1
+        new_rank = step(matrix, rank, damping_factor, dangling)
+        residual = sum(abs(new - old) for new, old in zip(new_rank, rank))
+        rank = new_rank
+
+        if callback is not None:
+            callback({
+                "iteration": iterations,
+                "residual": residual,
+                "seconds": time.perf_counter() - start,
+                "memory": tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+            })
+        if residual < tolerance:
+            return rank, iterations, residual
+
+        # Jump ahead from the last few iterates every so often
+        if method == "quadratic":
+            history.append(rank)
+            if iterations % EXTRAPOLATION_PERIOD == 0:
+                rank = quadratic_extrapolation(*history)
+                history.clear()
+
+
+def pagerank_step(matrix, rank, damping_factor, dangling):
+    """
+    Return the ranks after one PageRank update of `rank`,
+    where `dangling` lists the pages without links.
+    """
+    in_offsets, in_links, out_degree = matrix
+    n = len(out_degree)
+
+    # Rank each page passes along every one of its links
+    share = array("d", (
+        rank[i] / out_degree[i] if out_degree[i] else 0 for i in range(n)
+    ))
+    base = (1 - damping_factor + damping_factor * sum(rank[i] for i in dangling)) / n
+
+    return array("d", (
+        base + damping_factor * sum(map(share.__getitem__, in_links[in_offsets[j]:in_offsets[j + 1]]))
+        for j in range(n)
+    ))
+
+
+def gauss_seidel_step(matrix, rank, damping_factor, dangling):
+    """
+    Return the ranks after one Gauss-Seidel sweep over `rank`: pages
+    are updated in order, each from the newest ranks of the pages
+    linking to it, where `dangling` lists the pages without links.
+    The result is normalized to sum to 1.
+    """
+    in_offsets, in_links, out_degree = matrix
+    n = len(out_degree)
+    rank = array("d", rank)
+    share = array("d", (
+        rank[i] / out_degree[i] if out_degree[i] else 0 for i in range(n)
+    ))
+    dangling_rank = sum(rank[i] for i in dangling)
+
+    for j in range(n):
+        value = (
+            (1 - damping_factor + damping_factor * dangling_rank) / n
+            + damping_factor * sum(map(share.__getitem__, in_links[in_offsets[j]:in_offsets[j + 1]]))
+        )
+        if out_degree[j]:
+            share[j] = value / out_degree[j]
+        else:
+            dangling_rank += value - rank[j]
+        rank[j] = value
+
+    # Sweeps drift off a total of 1, which they would only slowly recover
+    total = sum(rank)
+    return array("d", (value / total for value in rank))
+
+
+def quadratic_extrapolation(first, second, third, fourth):
+    """
+    Return the quadratic extrapolation of Kamvar et al. from four
+    successive iterates, normalized to sum to 1: it assumes the error
+    lies mostly along the two leading non-principal eigenvectors
+    and cancels them with a least squares fit.
+    """
+    y1 = [b - a for a, b in zip(first, second)]
+    y2 = [c - a for a, c in zip(first, third)]
+    y3 = [d - a for a, d in zip(first, fourth)]
+
+    # Solve the 2 x 2 normal equations for the fit
+    a11 = sum(u * u for u in y1)
+    a12 = sum(u * v for u, v in zip(y1, y2))
+    a22 = sum(v * v for v in y2)
+    b1 = -sum(u * w for u, w in zip(y1, y3))
+    b2 = -sum(v * w for v, w in zip(y2, y3))
+    determinant = a11 * a22 - a12 * a12
+    if not determinant:
+        return fourth
+    gamma1 = (b1 * a22 - b2 * a12) / determinant
+    gamma2 = (a11 * b2 - a12 * b1) / determinant
+    beta0, beta1, beta2 = gamma1 + gamma2 + 1, gamma2 + 1, 1
+
+    return normalized(array("d", (
+        beta0 * b + beta1 * c + beta2 * d
+        for b, c, d in zip(second, third, fourth)
+    )), fourth)
+
+
+def normalized(rank, fallback):
+    """
+    Return `rank` with negative values cut to 0, scaled to sum to 1,
+    or `fallback` if nothing positive is left.
+    """
+    rank = array("d", (max(0, value) for value in rank))
+    total = sum(rank)
+    if not total:
+        return fallback
+    return array("d", (value / total for value in rank))
+
+
+def incremental_pagerank(pages, offsets, links, damping_factor, previous,
+                         tolerance=TOLERANCE, baseline=None):
+    """
+    Return (ranks, stats) for an edited link graph, starting from the
+    `previous` dictionary of PageRank values by page name.
+
+    One pass over the graph finds how far each page is from consistent
+    with its in-links. Pages off by more than `tolerance`, which are
+    the edited pages and their neighborhoods, then push their residual
+    along their links, largest first, so the change spreads only as far
+    as it matters. Power iteration from there settles the small, spread
+    out remainder.
+
+    `stats` reports the pushes made, the work done in equivalent full
+    iterations, the final L1 residual and, given the `baseline` number
+    of iterations a cold start takes, the iterations saved.
+    """
+    n = len(pages)
+    matrix = transition_matrix(offsets, links)
+    out_degree = matrix[2]
+    dangling = [i for i in range(n) if out_degree[i] == 0]
+
+    # Warm start, giving new pages the uniform rank
+    rank = array("d", (previous.get(page, 1 / n) for page in pages))
+    total = sum(rank)
+    rank = array("d", (value / total for value in rank))
+
+    residual = array("d", (
+        new - old for new, old in zip(pagerank_step(matrix, rank, damping_factor, dangling), rank)
+    ))
+    work = len(links) + n
+    pushes = 0
+
+    # Push the page furthest from consistent next, skipping entries
+    # left behind by later changes to the same page. Residual from
+    # pages without links is spread over every page, so it is left
+    # for the power iteration.
+    heap = [(-abs(value), i) for i, value in enumerate(residual) if abs(value) > tolerance]
+    heapq.heapify(heap)
+    while heap:
+        size, i = heapq.heappop(heap)
+        delta = residual[i]
+        if -size != abs(delta) or not out_degree[i]:
+            continue
+        rank[i] += delta
+        residual[i] = 0
+        pushes += 1
+        share = damping_factor * delta / out_degree[i]
+        for j in links[offsets[i]:offsets[i + 1]]:
+            residual[j] += share
+            if abs(residual[j]) > tolerance:
+                heapq.heappush(heap, (-abs(residual[j]), j))
+        work += out_degree[i]
+
+    # The true ranks sum to 1, and a total off from 1 would
+    # otherwise only decay by the damping factor per iteration
+    total = sum(rank)
+    rank = array("d", (value / total for value in rank))
+    rank, iterations, final = power_iteration(matrix, damping_factor, tolerance, rank)
+    iterations += work / (len(links) + n)
+    stats = {
+        "pushes": pushes,
+        "iterations": iterations,
+        "iterations_saved": None if baseline is None else baseline - iterations,
+        "residual": final
+    }
+    return dict(zip(pages, rank)), stats
+
+
+def personalized_pagerank(pages, offsets, links, damping_factor, seeds, tolerance=TOLERANCE):
+    """
+    Return one dictionary of PageRank values per entry of `seeds`, each
+    computed with random jumps landing only on that entry's pages:
+    a collection of page names to jump to uniformly, or a dictionary
+    of page names to weights for topic-sensitive ranks.
+
+    All vectors are iterated together as one block: every pass over the
+    links updates the rank of a page in every vector at once. Rank on
+    pages without links jumps the same way as the random jumps do.
+    """
+    n = len(pages)
+    k = len(seeds)
+    index = {page: i for i, page in enumerate(pages)}
+    in_offsets, in_links, out_degree = transition_matrix(offsets, links)
+    dangling = [i for i in range(n) if out_degree[i] == 0]
+
+    # Normalize each jump distribution, keeping only the pages it lands on
+    teleports = []
+    for seed in seeds:
+        weights = seed if isinstance(seed, dict) else dict.fromkeys(seed, 1)
+        total = sum(weights.values())
+        teleports.append({index[page]: weight / total for page, weight in weights.items() if weight})
+
+    # Row i of the block holds the rank of page i in every vector
+    block = array("d", [0]) * (n * k)
+    for v, teleport in enumerate(teleports):
+        for i, p in teleport.items():
+            block[i * k + v] = p
+
     while True:
-        for key in page_rank:
-            i = 0
-            page_rank_temp[key] = (1 - damping_factor) / len(corpus)
-            for values in corpus.values():
-                if key in values:
-                    page_rank_temp[key] += damping_factor * list(page_rank.values())[i] / len(list(corpus.values())[i])
-                i += 1
-        
-        # Define breaking point for minor improvements
-        count = 0
-        for key in page_rank:
-            if page_rank[key] - page_rank_temp[key] < 0.00001 and page_rank[key] - page_rank_temp[key] > -0.00001:
-                count += 1
-        if count == 4:
-            break
-        
-        # Update probability distribution
-        page_rank = copy.deepcopy(page_rank_temp)
-
-    # Return probability distribution
-    return page_rank
+
+        # Rank each page passes along every one of its links, per vector
+        shares = [
+            [value / out_degree[i] for value in block[i * k:(i + 1) * k]] if out_degree[i] else None
+            for i in range(n)
+        ]
+        jumps = [
+            (1 - damping_factor) + damping_factor * sum(block[i * k + v] for i in dangling)
+            for v in range(k)
+        ]
+
+        new_block = array("d")
+        for j in range(n):
+            total = [0] * k
+            for i in in_links[in_offsets[j]:in_offsets[j + 1]]:
+                total = list(map(operator.add, total, shares[i]))
+            new_block.extend(damping_factor * value for value in total)
+        for v, teleport in enumerate(teleports):
+            for i, p in teleport.items():
+                new_block[i * k + v] += jumps[v] * p
+
+        # Stop once every vector has converged
+        residuals = [0] * k
+        for position, (new, old) in enumerate(zip(new_block, block)):
+            residuals[position % k] += abs(new - old)
+        block = new_block
+        if max(residuals, default=0) < tolerance:
+            return [
+                {page: block[i * k + v] for i, page in enumerate(pages)}
+                for v in range(k)
+            ]
+
+
+def block_pagerank(output, damping_factor, blocks=16, workers=1, tolerance=TOLERANCE):
+    """
+    Return (rank, iterations, residual) for the edge list that
+    graph.crawl_edges wrote to `output`, without ever holding its
+    links in memory.
+
+    The links are first split by target page into `blocks` shard files.
+    Each iteration then streams every shard from disk in turn, or
+    across `workers` processes, computing the new rank of that block's
+    pages from the previous iteration's shares. Only per-page arrays
+    are kept in memory.
+    """
+    with open(f"{output}.pages", encoding="utf-8") as f:
+        n = sum(1 for _ in f)
+    size = -(-n // blocks)
+    ranges = [(lo, min(n, lo + size)) for lo in range(0, n, size)]
+
+    directory = tempfile.mkdtemp(prefix="pagerank-", dir=os.path.dirname(os.path.abspath(output)))
+    pool = multiprocessing.Pool(workers) if workers > 1 else None
+    try:
+        shards = [os.path.join(directory, f"{b}.edges") for b in range(len(ranges))]
+        out_degree = shard_edges(f"{output}.edges", shards, n, size)
+        shares = os.path.join(directory, "shares")
+        dangling = [i for i in range(n) if out_degree[i] == 0]
+
+        rank = array("d", [1 / n]) * n
+        iterations = 0
+        while True:
+            iterations += 1
+
+            # Rank each page passes along every one of its links, where workers can map it
+            with open(shares, "wb") as f:
+                f.write(array("d", (
+                    rank[i] / out_degree[i] if out_degree[i] else 0 for i in range(n)
+                )).tobytes())
+            base = (1 - damping_factor + damping_factor * sum(rank[i] for i in dangling)) / n
+
+            jobs = [
+                (shard, shares, lo, hi, base, damping_factor)
+                for shard, (lo, hi) in zip(shards, ranges)
+            ]
+            new_rank = array("d")
+            for block in (pool.starmap(rank_block, jobs) if pool else map(rank_block, *zip(*jobs))):
+                new_rank.extend(block)
+
+            residual = sum(abs(new - old) for new, old in zip(new_rank, rank))
+            rank = new_rank
+            if residual < tolerance:
+                break
+    finally:
+        if pool:
+            pool.terminate()
+        shutil.rmtree(directory)
+
+    return rank, iterations, residual
+
+
+def edge_chunks(path):
+    """
+    Yield arrays of up to EDGE_CHUNK (source, target) pairs,
+    flattened, from a memory-mapped edge file.
+    """
+    if os.path.getsize(path) == 0:
+        return
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        step = 8 * EDGE_CHUNK
+        for start in range(0, len(data), step):
+            pairs = array("i")
+            pairs.frombytes(data[start:start + step])
+            yield pairs
+
+
+def shard_edges(path, shards, n, size):
+    """
+    Copy each link of an edge file into the shard file for the block
+    of `size` pages its target falls in, and return every page's out-degree.
+    """
+    out_degree = array("i", [0]) * n
+    files = [open(shard, "wb") for shard in shards]
+    try:
+        for pairs in edge_chunks(path):
+            buffers = [array("i") for _ in files]
+            for i, j in zip(pairs[0::2], pairs[1::2]):
+                out_degree[i] += 1
+                buffers[j // size].extend((i, j))
+            for f, buffer in zip(files, buffers):
+                f.write(buffer.tobytes())
+    finally:
+        for f in files:
+            f.close()
+    return out_degree
+
+
+def rank_block(shard, shares, lo, hi, base, damping_factor):
+    """
+    Return the new ranks of pages lo to hi from the shard holding the
+    links into them and the file of shares each page passes along.
+    """
+    total = array("d", [0]) * (hi - lo)
+    with open(shares, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        share = memoryview(data).cast("d")
+        try:
+            for pairs in edge_chunks(shard):
+                for i, j in zip(pairs[0::2], pairs[1::2]):
+                    total[j - lo] += share[i]
+        finally:
+            share.release()
+    return array("d", (base + damping_factor * value for value in total))
 
 
 if __name__ == "__main__":